@@ -1,10 +1,16 @@
+import json
 import logging
 import pathlib
 import sys
+import tempfile
+import time
+import typing
 
 import click
 
 import another_swayrst
+import another_swayrst.recording
+import another_swayrst.sessions
 
 _logger = logging.getLogger(__name__)
 
@@ -63,6 +69,71 @@ _logger = logging.getLogger(__name__)
     default=None,
     help="Respect the configuration of other workspaces.",
 )
+@click.option(
+    "--prioritize-visible/--no-prioritize-visible",
+    default=None,
+    help="Start and restore the apps of the visible workspaces first, the other workspaces afterwards.",
+)
+@click.option(
+    "--launch-timeout",
+    default=None,
+    type=click.FloatRange(min=0),
+    help="Seconds after which no more missing apps are started.",
+)
+@click.option(
+    "--max-fix-iterations",
+    default=None,
+    type=click.IntRange(min=0),
+    help="Maximal number of iterations to fix differences after restoring a profile.",
+)
+@click.option(
+    "--restore-outputs/--no-restore-outputs",
+    default=None,
+    help="(Not) Apply the saved mode, position, scale and transform of the outputs when loading.",
+)
+@click.option(
+    "--on-concurrent-run",
+    default=None,
+    type=click.Choice(["wait", "exit"]),
+    help="Wait for a running save/load (only the newest waiting request runs) or exit.",
+)
+@click.option(
+    "--socket",
+    "socket_paths",
+    default=None,
+    multiple=True,
+    type=click.Path(dir_okay=False, file_okay=True, exists=True, resolve_path=True),
+    help="IPC socket of the sway/i3 session to use, could be set multiple times.",
+)
+@click.option(
+    "--socket-dir",
+    default=None,
+    type=click.Path(
+        dir_okay=True,
+        file_okay=False,
+        exists=True,
+        resolve_path=True,
+        path_type=pathlib.Path,
+    ),
+    help="Use all sway/i3 sessions with an IPC socket in this directory.",
+)
+@click.option(
+    "--metrics-file",
+    default=None,
+    type=click.Path(
+        dir_okay=False, file_okay=True, resolve_path=True, path_type=pathlib.Path
+    ),
+    help="Write prometheus textfile metrics of save/load to this file.",
+)
+@click.option(
+    "--record",
+    "record_file",
+    default=None,
+    type=click.Path(
+        dir_okay=False, file_okay=True, resolve_path=True, path_type=pathlib.Path
+    ),
+    help="Record all IPC messages of save/load to this file for the replay command.",
+)
 def main(
     ctx,
     log_level: str,
@@ -72,28 +143,90 @@ def main(
     profile_dir: pathlib.Path | None,
     command_translation: tuple[tuple[str, str]] | None,
     respect_other_workspaces: bool | None,
+    prioritize_visible: bool | None,
+    launch_timeout: float | None,
+    max_fix_iterations: int | None,
+    on_concurrent_run: str | None,
+    restore_outputs: bool | None,
+    socket_paths: tuple[str, ...],
+    socket_dir: pathlib.Path | None,
+    metrics_file: pathlib.Path | None,
+    record_file: pathlib.Path | None,
 ):
+    all_socket_paths: list[str | None] = list(socket_paths)
+    if socket_dir is not None:
+        for socket_path in another_swayrst.sessions.find_sockets(socket_dir):
+            if socket_path not in all_socket_paths:
+                all_socket_paths.append(socket_path)
+        if len(all_socket_paths) == 0:
+            click.echo(f"no ipc socket found in {socket_dir}", err=True)
+            sys.exit(1005)
+    if len(all_socket_paths) == 0:
+        all_socket_paths.append(None)
+
+    log_format: str = "%(asctime)s %(levelname)-8s %(message)s"
+    if len(all_socket_paths) > 1:
+        log_format = "%(asctime)s %(levelname)-8s [%(threadName)s] %(message)s"
     log_handlers = []
     # log_stream_handler = logging.StreamHandler(sys.stderr)
     log_stream_handler = logging.StreamHandler(sys.stdout)
     log_handlers.append(log_stream_handler)
     logging.basicConfig(
         handlers=log_handlers,
-        format="%(asctime)s %(levelname)-8s %(message)s",
+        format=log_format,
         level=logging._nameToLevel[log_level],
     )
     _logger.info(
         f"another-swayrst started with log-level: {logging.getLevelName(logging.root.level)}"
     )
-    obj = another_swayrst.AnotherSwayrst(
-        config_file=config_file,
-        start_missing_apps=start_missing_apps,
-        save_current_config=save_current_config,
-        profile_dir=profile_dir,
-        command_translation=command_translation,
-        respect_other_workspaces=respect_other_workspaces,
-    )
-    ctx.params["obj"] = obj
+    if ctx.invoked_subcommand == "replay":
+        # a replay doesn't need a running sway/i3 session
+        return
+    # history and check only work on the profile files
+    offline: bool = ctx.invoked_subcommand in ["history", "check"]
+    sessions: dict[str | None, another_swayrst.AnotherSwayrst] = {}
+    for socket_path in all_socket_paths:
+        sessions[socket_path] = another_swayrst.AnotherSwayrst(
+            config_file=config_file,
+            start_missing_apps=start_missing_apps,
+            save_current_config=save_current_config,
+            profile_dir=profile_dir,
+            command_translation=command_translation,
+            respect_other_workspaces=respect_other_workspaces,
+            prioritize_visible=prioritize_visible,
+            launch_timeout=launch_timeout,
+            max_fix_iterations=max_fix_iterations,
+            on_concurrent_run=on_concurrent_run,
+            restore_outputs=restore_outputs,
+            socket_path=socket_path,
+            metrics_file=metrics_file,
+            record_file=record_file,
+            offline=offline,
+        )
+    ctx.params["obj"] = sessions[all_socket_paths[0]]
+    ctx.params["sessions"] = sessions
+
+
+def run_for_all_sessions(
+    ctx,
+    action: typing.Callable[[str | None, another_swayrst.AnotherSwayrst], None],
+) -> None:
+    """Run an action for the session, multiple sessions are handled concurrently."""
+
+    sessions: dict[str | None, another_swayrst.AnotherSwayrst] = ctx.parent.params[
+        "sessions"
+    ]
+    if len(sessions) == 1:
+        for socket_path, obj in sessions.items():
+            action(socket_path, obj)
+        return
+
+    start: float = time.perf_counter()
+    results = another_swayrst.sessions.run_sessions(sessions, action)  # type: ignore
+    another_swayrst.sessions.print_report(results, time.perf_counter() - start)
+    for result in results:
+        if result.exit_code != 0:
+            sys.exit(result.exit_code)
 
 
 @main.command()
@@ -108,21 +241,213 @@ def main(
     multiple=True,
     help="Workspace (by name) to save.",
 )
-def save(ctx, profile_name: str, workspaces: tuple[str]) -> None:
-    """Save current window layout."""
+@click.option(
+    "-u",
+    "--update",
+    is_flag=True,
+    default=False,
+    help="Only replace the changed (or the given) workspaces of the existing profile.",
+)
+def save(ctx, profile_name: str, workspaces: tuple[str], update: bool) -> None:
+    """Save current window layout.
+
+    With multiple sessions every session is saved as <PROFILE_NAME>@<SESSION>.
+    """
+
+    multiple_sessions: bool = len(ctx.parent.params["sessions"]) > 1
+
+    def action(socket_path: str | None, obj: another_swayrst.AnotherSwayrst) -> None:
+        if multiple_sessions and socket_path is not None:
+            session_name = another_swayrst.sessions.get_session_name(socket_path)
+            obj.save(f"{profile_name}@{session_name}", workspaces, update)
+        else:
+            obj.save(profile_name, workspaces, update)
+
+    run_for_all_sessions(ctx, action)
+
+
+@main.command()
+@click.pass_context
+@click.argument("profile_names", nargs=-1, required=True)
+@click.option(
+    "-r",
+    "--revision",
+    default=None,
+    type=int,
+    help="Revision of the (first) profile to load, default is the latest revision.",
+)
+def load(ctx, profile_names: tuple[str, ...], revision: int | None):
+    """Load and restore the specified profile.
+
+    Several profiles are merged into one layout, the workspaces of later profiles replace
+    the workspaces with the same name of earlier profiles.
+
+    With multiple sessions <PROFILE_NAME>@<SESSION> is preferred if it exists.
+    """
+
+    multiple_sessions: bool = len(ctx.parent.params["sessions"]) > 1
+
+    def action(socket_path: str | None, obj: another_swayrst.AnotherSwayrst) -> None:
+        names: list[str] = list(profile_names)
+        if multiple_sessions and socket_path is not None:
+            names = [
+                another_swayrst.sessions.get_session_profile_name(
+                    obj, profile_name, socket_path
+                )
+                for profile_name in profile_names
+            ]
+        obj.load(names[0], revision, names[1:])
+
+    run_for_all_sessions(ctx, action)
+
+
+@main.command()
+@click.pass_context
+@click.argument("profile_names", nargs=-1, required=True)
+@click.option(
+    "-o",
+    "--output",
+    "script_file",
+    default=None,
+    type=click.Path(
+        dir_okay=False, file_okay=True, resolve_path=True, path_type=pathlib.Path
+    ),
+    help="Script to write, default is <PROFILE_NAME>.swaymsg.sh in the profile directory.",
+)
+@click.option(
+    "--if-stale",
+    is_flag=True,
+    default=False,
+    help="Only rebuild the script if the windows or outputs changed since it was compiled.",
+)
+def compile(
+    ctx,
+    profile_names: tuple[str, ...],
+    script_file: pathlib.Path | None,
+    if_stale: bool,
+):
+    """Write a swaymsg script which restores the profile(s) with the running windows."""
 
     obj: another_swayrst.AnotherSwayrst = ctx.parent.params["obj"]
-    obj.save(profile_name, workspaces)
+    obj.compile(profile_names[0], script_file, if_stale, list(profile_names[1:]))
 
 
 @main.command()
 @click.pass_context
 @click.argument("profile_name")
-def load(ctx, profile_name: str):
-    """Load and restore the specified profile."""
+@click.option(
+    "--prune",
+    "keep",
+    default=None,
+    type=click.IntRange(min=0),
+    help="Remove all but the newest KEEP older revisions.",
+)
+def history(ctx, profile_name: str, keep: int | None):
+    """Show (and prune) the saved revisions of a profile.
+
+    With multiple sessions the revisions of <PROFILE_NAME>@<SESSION> are shown if it exists.
+    """
+
+    sessions: dict[str | None, another_swayrst.AnotherSwayrst] = ctx.parent.params[
+        "sessions"
+    ]
+    shown_profiles: set[str] = set()
+    for socket_path, obj in sessions.items():
+        name: str = profile_name
+        if len(sessions) > 1 and socket_path is not None:
+            name = another_swayrst.sessions.get_session_profile_name(
+                obj, profile_name, socket_path
+            )
+        if name in shown_profiles:
+            continue
+        shown_profiles.add(name)
+        if len(sessions) > 1:
+            print(f"profile {name}:")
+        obj.show_history(name, keep)
+
+
+@main.command()
+@click.pass_context
+@click.option(
+    "-j",
+    "--jobs",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of worker processes, default is the number of CPUs.",
+)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    default=False,
+    help="Only report the upgrades, don't write the profiles.",
+)
+def check(ctx, jobs: int | None, dry_run: bool):
+    """Validate all profiles and upgrade old node versions in place."""
 
     obj: another_swayrst.AnotherSwayrst = ctx.parent.params["obj"]
-    obj.load(profile_name)
+    if not obj.check(jobs, dry_run):
+        sys.exit(1007)
+
+
+@main.command()
+@click.pass_context
+@click.argument(
+    "recording_file",
+    type=click.Path(
+        dir_okay=False,
+        file_okay=True,
+        exists=True,
+        resolve_path=True,
+        path_type=pathlib.Path,
+    ),
+)
+def replay(ctx, recording_file: pathlib.Path):
+    """Replay a recorded load offline and compare it with the recording."""
+
+    replay_source = another_swayrst.recording.Replay(recording_file)
+    recording: dict = replay_source.recording
+    if recording["action"] != "load" or recording["profile"] is None:
+        click.echo(f"{recording_file} is no recording of a load", err=True)
+        sys.exit(1008)
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        profile_dir = pathlib.Path(temporary_dir)
+        config: dict = {
+            **recording["config"],
+            "profile_dir": str(profile_dir),
+            "metrics_file": None,
+        }
+        config_file: pathlib.Path = profile_dir.joinpath("another-swayrst.conf")
+        with config_file.open("w") as FILE:
+            json.dump(config, FILE)
+        with profile_dir.joinpath(f"{recording['profile_name']}.json").open(
+            "w"
+        ) as FILE:
+            json.dump(recording["profile"], FILE)
+
+        obj = another_swayrst.AnotherSwayrst(
+            config_file=config_file,
+            start_missing_apps=None,
+            save_current_config=False,
+            profile_dir=None,
+            command_translation=None,
+            respect_other_workspaces=None,
+            replay=replay_source,
+        )
+        start: float = time.perf_counter()
+        obj.load(recording["profile_name"])
+        duration: float = time.perf_counter() - start
+
+    summary: dict = recording["summary"]
+    connection = replay_source.connection
+    print(f"{'':<14}{'recorded':>12}{'replayed':>12}")
+    print(f"{'duration':<14}{summary['duration']:>11.3f}s{duration:>11.3f}s")
+    for name, value in [
+        ("ipc_messages", connection.message_count),
+        ("commands", connection.command_count),
+        ("tree_bytes", connection.tree_bytes),
+    ]:
+        print(f"{name:<14}{summary[name]:>12}{value:>12}")
 
 
 @main.command()
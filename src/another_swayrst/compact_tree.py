@@ -0,0 +1,565 @@
+import hashlib
+import json
+import logging
+import typing
+
+import another_swayrst.types as types
+
+_logger: logging.Logger = logging.getLogger(__name__)
+
+KIND_ROOT: int = 0
+KIND_OUTPUT: int = 1
+KIND_WORKSPACE: int = 2
+KIND_CONTAINER: int = 3
+KIND_APP: int = 4
+
+MARK_PREFIX: str = "_another_swayrst_"
+
+
+class CompactTree:
+    """Array based representation of a window tree used by the restore engine.
+
+    Every node is an index into the attribute lists, the nodes are stored in depth first
+    pre-order, so the children of a node always have a higher index than the node itself.
+    The apps of every subtree are stored as the range leaf_start:leaf_end in leaves, the
+    tiled apps of a workspace are always stored in front of its floating apps.
+    """
+
+    __slots__ = (
+        "ids",
+        "kinds",
+        "parents",
+        "children",
+        "floating_children",
+        "names",
+        "layouts",
+        "numbers",
+        "commands",
+        "widths",
+        "heights",
+        "width_fractions",
+        "height_fractions",
+        "visible",
+        "marks",
+        "fullscreen_modes",
+        "sticky",
+        "borders",
+        "border_widths",
+        "leaves",
+        "leaf_start",
+        "leaf_end",
+        "first_app",
+    )
+
+    def __init__(self) -> None:
+        self.ids: list[int] = []
+        self.kinds: list[int] = []
+        self.parents: list[int] = []
+        self.children: list[list[int]] = []
+        self.floating_children: list[list[int]] = []
+        self.names: list[str] = []
+        self.layouts: list[str] = []
+        self.numbers: list[int | None] = []
+        self.commands: list[list[str]] = []
+        self.widths: list[int | None] = []
+        self.heights: list[int | None] = []
+        self.width_fractions: list[float | None] = []
+        self.height_fractions: list[float | None] = []
+        self.visible: list[bool] = []
+        self.marks: list[list[str]] = []
+        self.fullscreen_modes: list[int] = []
+        self.sticky: list[bool | None] = []
+        self.borders: list[str | None] = []
+        self.border_widths: list[int | None] = []
+        self.leaves: list[int] = []
+        self.leaf_start: list[int] = []
+        self.leaf_end: list[int] = []
+        self.first_app: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __add_node(
+        self,
+        kind: int,
+        id: int,
+        parent: int,
+        floating: bool = False,
+        name: str = "",
+        layout: str = "",
+        number: int | None = None,
+        command: list[str] | None = None,
+        width: int | None = None,
+        height: int | None = None,
+        width_fraction: float | None = None,
+        height_fraction: float | None = None,
+        visible: bool = False,
+        marks: list[str] | None = None,
+        fullscreen_mode: int = 0,
+        sticky: bool | None = None,
+        border: str | None = None,
+        border_width: int | None = None,
+    ) -> int:
+        """Append a node to the tree and return its index."""
+
+        index: int = len(self.ids)
+        self.ids.append(id)
+        self.kinds.append(kind)
+        self.parents.append(parent)
+        self.children.append([])
+        self.floating_children.append([])
+        self.names.append(name)
+        self.layouts.append(layout)
+        self.numbers.append(number)
+        self.commands.append(command if command is not None else [])
+        self.widths.append(width)
+        self.heights.append(height)
+        self.width_fractions.append(width_fraction)
+        self.height_fractions.append(height_fraction)
+        self.visible.append(visible)
+        self.marks.append(marks if marks is not None else [])
+        self.fullscreen_modes.append(fullscreen_mode)
+        self.sticky.append(sticky)
+        self.borders.append(border)
+        self.border_widths.append(border_width)
+        self.leaf_start.append(len(self.leaves))
+        self.leaf_end.append(len(self.leaves))
+        self.first_app.append(-1)
+        if kind == KIND_APP:
+            self.leaves.append(index)
+        if parent >= 0:
+            if floating:
+                self.floating_children[parent].append(index)
+            else:
+                self.children[parent].append(index)
+        return index
+
+    def __finalize(self) -> None:
+        """Compute the leaf range and the first app of every subtree."""
+
+        for index in range(len(self.ids) - 1, -1, -1):
+            if self.kinds[index] == KIND_APP:
+                self.leaf_end[index] = self.leaf_start[index] + 1
+                self.first_app[index] = index
+                continue
+            if len(self.children[index]) > 0:
+                self.leaf_end[index] = self.leaf_end[self.children[index][-1]]
+                self.first_app[index] = self.first_app[self.children[index][0]]
+            if len(self.floating_children[index]) > 0:
+                self.leaf_end[index] = self.leaf_end[self.floating_children[index][-1]]
+
+    def __tiled_leaf_end(self, index: int) -> int:
+        """Return the end of the range of tiled apps in the subtree of a node."""
+
+        if len(self.children[index]) == 0:
+            return self.leaf_start[index]
+        return self.leaf_end[self.children[index][-1]]
+
+    def apps(self, index: int) -> list[int]:
+        """Return the indices of all apps in the subtree of a node."""
+
+        return self.leaves[self.leaf_start[index] : self.leaf_end[index]]
+
+    def tiled_apps(self, index: int) -> list[int]:
+        """Return the indices of all tiled apps in the subtree of a node."""
+
+        return self.leaves[self.leaf_start[index] : self.__tiled_leaf_end(index)]
+
+    def floating_apps(self, index: int) -> list[int]:
+        """Return the indices of all floating apps of a workspace."""
+
+        return self.leaves[self.__tiled_leaf_end(index) : self.leaf_end[index]]
+
+    def get_visible_workspaces(self) -> list[int]:
+        """Return the visible workspace of every output, the first workspace if it is unknown."""
+
+        visible_workspaces: list[int] = []
+        for output in self.children[0]:
+            if self.names[output] == "__i3" or len(self.children[output]) == 0:
+                continue
+            for workspace in self.children[output]:
+                if self.visible[workspace]:
+                    visible_workspaces.append(workspace)
+                    break
+            else:
+                visible_workspaces.append(self.children[output][0])
+        return visible_workspaces
+
+    def get_first_present_apps(self, present_ids: typing.Container[int]) -> list[int]:
+        """Return for every node the index of the first app in its subtree whose id is in present_ids or -1."""
+
+        first_present: list[int] = [-1] * len(self.ids)
+        for index in range(len(self.ids) - 1, -1, -1):
+            if self.kinds[index] == KIND_APP:
+                if self.ids[index] in present_ids:
+                    first_present[index] = index
+            elif (
+                self.first_app[index] != -1
+                and first_present[self.first_app[index]] != -1
+            ):
+                first_present[index] = self.first_app[index]
+            else:
+                for child in self.children[index]:
+                    if first_present[child] != -1:
+                        first_present[index] = first_present[child]
+                        break
+        return first_present
+
+    @classmethod
+    def from_profile(cls, tree: types.Tree) -> "CompactTree":
+        """Create a compact tree from a profile."""
+
+        compact_tree = cls()
+        root: int = compact_tree.__add_node(KIND_ROOT, 0, -1)
+        current_workspaces: dict[int, str | None] = {}
+        stack: list[tuple[types.TreeElement, int, bool]] = [
+            (output, root, False) for output in reversed(tree.outputs)
+        ]
+        while len(stack) > 0:
+            element, parent, floating = stack.pop()
+            if isinstance(element, types.Output):
+                index = compact_tree.__add_node(
+                    KIND_OUTPUT,
+                    element.id,
+                    parent,
+                    name=element.name,
+                    width=element.width,
+                    height=element.height,
+                )
+                current_workspaces[index] = element.current_workspace
+                stack += [
+                    (workspace, index, False)
+                    for workspace in reversed(element.workspaces)
+                ]
+            elif isinstance(element, types.Workspace):
+                index = compact_tree.__add_node(
+                    KIND_WORKSPACE,
+                    element.id,
+                    parent,
+                    name=element.name,
+                    layout=element.layout,
+                    number=element.number,
+                    width_fraction=element.width_fraction,
+                    height_fraction=element.height_fraction,
+                    visible=element.name == current_workspaces[parent],
+                )
+                stack += [
+                    (container, index, True)
+                    for container in reversed(element.floating_containers)
+                ]
+                stack += [
+                    (container, index, False)
+                    for container in reversed(element.containers)
+                ]
+            elif isinstance(element, types.Container):
+                index = compact_tree.__add_node(
+                    KIND_CONTAINER,
+                    element.id,
+                    parent,
+                    floating=floating,
+                    layout=element.layout,
+                    width_fraction=element.width_fraction,
+                    height_fraction=element.height_fraction,
+                )
+                stack += [
+                    (container, index, False)
+                    for container in reversed(element.sub_containers)
+                ]
+            elif isinstance(element, types.AppContainer):
+                compact_tree.__add_node(
+                    KIND_APP,
+                    element.id,
+                    parent,
+                    floating=floating,
+                    name=element.title,
+                    command=element.command,
+                    width=element.width,
+                    height=element.height,
+                    width_fraction=element.width_fraction,
+                    height_fraction=element.height_fraction,
+                    marks=element.marks,
+                    fullscreen_mode=element.fullscreen_mode,
+                    sticky=element.sticky,
+                    border=element.border,
+                    border_width=element.border_width,
+                )
+        compact_tree.__finalize()
+        return compact_tree
+
+    @classmethod
+    def from_ipc(
+        cls,
+        root_node: dict,
+        get_command: typing.Callable[[int], list[str]],
+        include_workspace: typing.Callable[[str, str], bool] | None = None,
+    ) -> "CompactTree":
+        """Create a compact tree from the data of an i3ipc GET_TREE reply.
+
+        Workspaces for which include_workspace returns False are skipped before their
+        containers are parsed.
+        """
+
+        compact_tree = cls()
+        root: int = compact_tree.__add_node(KIND_ROOT, root_node["id"], -1)
+        current_workspaces: dict[int, str | None] = {}
+        stack: list[tuple[dict, int, int, bool, dict]] = [
+            (node, KIND_OUTPUT, root, False, root_node["rect"])
+            for node in reversed(root_node["nodes"])
+        ]
+        while len(stack) > 0:
+            node, kind, parent, floating, parent_rect = stack.pop()
+            if kind == KIND_OUTPUT:
+                if node["type"] != "output":
+                    _logger.warning(f"Unexpected node type found: {node['type']}")
+                index = compact_tree.__add_node(
+                    KIND_OUTPUT,
+                    node["id"],
+                    parent,
+                    name=node["name"],
+                    width=node["rect"]["width"],
+                    height=node["rect"]["height"],
+                )
+                current_workspaces[index] = node.get("current_workspace")
+                stack += [
+                    (sub_node, KIND_WORKSPACE, index, False, node["rect"])
+                    for sub_node in reversed(node["nodes"])
+                ]
+            elif kind == KIND_WORKSPACE:
+                if node["type"] != "workspace":
+                    _logger.warning(f"Unexpected node type found: {node['type']}")
+                output_name: str = compact_tree.names[parent]
+                if include_workspace is not None and not include_workspace(
+                    output_name, node["name"]
+                ):
+                    continue
+                index = compact_tree.__add_node(
+                    KIND_WORKSPACE,
+                    node["id"],
+                    parent,
+                    name=node["name"],
+                    layout=node["layout"],
+                    number=node.get("num"),
+                    width_fraction=get_fraction(node["rect"], parent_rect, "width"),
+                    height_fraction=get_fraction(node["rect"], parent_rect, "height"),
+                    visible=node["name"] == current_workspaces[parent],
+                )
+                stack += [
+                    (sub_node, KIND_CONTAINER, index, True, node["rect"])
+                    for sub_node in reversed(node["floating_nodes"])
+                ]
+                stack += [
+                    (sub_node, KIND_CONTAINER, index, False, node["rect"])
+                    for sub_node in reversed(node["nodes"])
+                ]
+            else:
+                if node["type"] not in ["con", "floating_con"]:
+                    _logger.warning(f"Unexpected node type found: {node['type']}")
+                width_fraction = get_fraction(node["rect"], parent_rect, "width")
+                height_fraction = get_fraction(node["rect"], parent_rect, "height")
+                if len(node["nodes"]) == 0:
+                    compact_tree.__add_node(
+                        KIND_APP,
+                        node["id"],
+                        parent,
+                        floating=floating,
+                        name=node["name"],
+                        command=get_command(node["pid"]),
+                        width=node["window_rect"]["width"],
+                        height=node["window_rect"]["height"],
+                        width_fraction=width_fraction,
+                        height_fraction=height_fraction,
+                        **get_app_state(node),
+                    )
+                else:
+                    index = compact_tree.__add_node(
+                        KIND_CONTAINER,
+                        node["id"],
+                        parent,
+                        floating=floating,
+                        layout=node["layout"],
+                        width_fraction=width_fraction,
+                        height_fraction=height_fraction,
+                    )
+                    stack += [
+                        (sub_node, KIND_CONTAINER, index, False, node["rect"])
+                        for sub_node in reversed(node["nodes"])
+                    ]
+        compact_tree.__finalize()
+        return compact_tree
+
+    def to_profile(self) -> types.Tree:
+        """Create the profile representation of the tree."""
+
+        elements: list[types.TreeElement | None] = [None] * len(self.ids)
+        for index in range(len(self.ids) - 1, 0, -1):
+            kind: int = self.kinds[index]
+            sub_elements: list = [elements[child] for child in self.children[index]]
+            if kind == KIND_APP:
+                elements[index] = types.AppContainer(
+                    id=self.ids[index],
+                    command=self.commands[index],
+                    width=self.widths[index],  # type: ignore
+                    height=self.heights[index],  # type: ignore
+                    title=self.names[index],
+                    width_fraction=self.width_fractions[index],
+                    height_fraction=self.height_fractions[index],
+                    marks=self.marks[index],
+                    fullscreen_mode=self.fullscreen_modes[index],
+                    sticky=self.sticky[index],
+                    border=self.borders[index],
+                    border_width=self.border_widths[index],
+                )
+            elif kind == KIND_CONTAINER:
+                elements[index] = types.Container(
+                    id=self.ids[index],
+                    sub_containers=sub_elements,
+                    layout=self.layouts[index],
+                    width_fraction=self.width_fractions[index],
+                    height_fraction=self.height_fractions[index],
+                )
+            elif kind == KIND_WORKSPACE:
+                elements[index] = types.Workspace(
+                    id=self.ids[index],
+                    name=self.names[index],
+                    containers=sub_elements,
+                    floating_containers=[
+                        elements[child]  # type: ignore
+                        for child in self.floating_children[index]
+                    ],
+                    number=self.numbers[index],
+                    layout=self.layouts[index],
+                    width_fraction=self.width_fractions[index],
+                    height_fraction=self.height_fractions[index],
+                )
+            elif kind == KIND_OUTPUT:
+                elements[index] = types.Output(
+                    id=self.ids[index],
+                    name=self.names[index],
+                    workspaces=sub_elements,
+                    width=self.widths[index],
+                    height=self.heights[index],
+                    current_workspace=next(
+                        (
+                            self.names[child]
+                            for child in self.children[index]
+                            if self.visible[child]
+                        ),
+                        None,
+                    ),
+                )
+        return types.Tree(
+            outputs=[elements[child] for child in self.children[0]]  # type: ignore
+        )
+
+
+def get_tree_checksum(root_node: dict) -> str:
+    """Return a checksum of the outputs and windows of a GET_TREE reply, independent of the layout."""
+
+    outputs: list[tuple[str, int, int]] = sorted(
+        (node["name"], node["rect"]["width"], node["rect"]["height"])
+        for node in root_node["nodes"]
+    )
+    windows: list[int] = []
+    stack: list[dict] = list(root_node["nodes"])
+    while len(stack) > 0:
+        node: dict = stack.pop()
+        if node["type"] in ["con", "floating_con"] and len(node["nodes"]) == 0:
+            windows.append(node["id"])
+        stack += node["nodes"] + node.get("floating_nodes", [])
+    return hashlib.sha256(
+        json.dumps([outputs, sorted(windows)]).encode("utf-8")
+    ).hexdigest()
+
+
+def get_app_state(node: dict) -> dict:
+    """Return the marks, fullscreen mode, sticky state and border of an app of a GET_TREE reply.
+
+    The temporary marks of another-swayrst are left out.
+    """
+
+    return {
+        "marks": [
+            mark for mark in node.get("marks", []) if not mark.startswith(MARK_PREFIX)
+        ],
+        "fullscreen_mode": node.get("fullscreen_mode", 0),
+        "sticky": node.get("sticky"),
+        "border": node.get("border"),
+        "border_width": node.get("current_border_width"),
+    }
+
+
+def get_workspace_signature_from_ipc(workspace_node: dict) -> list[tuple]:
+    """Return the structure, layouts, sizes, window states and ids of a workspace of a GET_TREE reply.
+
+    The signature equals the one of get_workspace_signature_from_profile for the saved
+    workspace, if the workspace didn't change since it was saved.
+    """
+
+    signature: list[tuple] = [(workspace_node["id"], workspace_node["layout"], False)]
+    stack: list[tuple[dict, dict, bool]] = [
+        (node, workspace_node["rect"], True)
+        for node in reversed(workspace_node["floating_nodes"])
+    ] + [
+        (node, workspace_node["rect"], False)
+        for node in reversed(workspace_node["nodes"])
+    ]
+    while len(stack) > 0:
+        node, parent_rect, floating = stack.pop()
+        signature.append(
+            (
+                node["id"],
+                node["layout"] if len(node["nodes"]) > 0 else None,
+                floating,
+                get_fraction(node["rect"], parent_rect, "width"),
+                get_fraction(node["rect"], parent_rect, "height"),
+                get_app_state(node) if len(node["nodes"]) == 0 else None,
+            )
+        )
+        stack += [
+            (sub_node, node["rect"], False) for sub_node in reversed(node["nodes"])
+        ]
+    return signature
+
+
+def get_workspace_signature_from_profile(workspace: dict) -> list[tuple]:
+    """Return the structure, layouts, sizes, window states and ids of a workspace of a profile."""
+
+    signature: list[tuple] = [(workspace["id"], workspace["layout"], False)]
+    stack: list[tuple[dict, bool]] = [
+        (container, True) for container in reversed(workspace["floating_containers"])
+    ] + [(container, False) for container in reversed(workspace["containers"])]
+    while len(stack) > 0:
+        container, floating = stack.pop()
+        signature.append(
+            (
+                container["id"],
+                container.get("layout"),
+                floating,
+                container.get("width_fraction"),
+                container.get("height_fraction"),
+                (
+                    {
+                        "marks": container.get("marks", []),
+                        "fullscreen_mode": container.get("fullscreen_mode", 0),
+                        "sticky": container.get("sticky"),
+                        "border": container.get("border"),
+                        "border_width": container.get("border_width"),
+                    }
+                    if "sub_containers" not in container
+                    else None
+                ),
+            )
+        )
+        stack += [
+            (sub_container, False)
+            for sub_container in reversed(container.get("sub_containers", []))
+        ]
+    return signature
+
+
+def get_fraction(rect: dict, parent_rect: dict, key: str) -> float | None:
+    """Return the size of rect relative to parent_rect for key ("width" or "height")."""
+
+    if parent_rect[key] <= 0:
+        return None
+    return round(rect[key] / parent_rect[key], 6)
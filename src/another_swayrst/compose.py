@@ -0,0 +1,88 @@
+import copy
+import logging
+
+_logger: logging.Logger = logging.getLogger(__name__)
+
+SUB_NODE_KEYS: list[str] = [
+    "workspaces",
+    "containers",
+    "floating_containers",
+    "sub_containers",
+]
+
+
+def get_nodes(tree_json: dict) -> list[dict]:
+    """Return all nodes (outputs, workspaces, containers and apps) of a profile."""
+
+    nodes: list[dict] = []
+    stack: list[dict] = list(tree_json["outputs"])
+    while len(stack) > 0:
+        node: dict = stack.pop()
+        nodes.append(node)
+        for key in SUB_NODE_KEYS:
+            stack += node.get(key, [])
+    return nodes
+
+
+def merge_profiles(tree_jsons: list[dict], reassign_ids: bool = True) -> dict:
+    """Merge several profiles into one, later profiles win.
+
+    Outputs are merged by name, the output settings of later profiles replace the settings
+    of earlier profiles if they are set. Workspaces are merged by name: a workspace of a
+    later profile replaces the workspace with the same name of earlier profiles, also if it
+    is on another output. With reassign_ids node ids which are already used by earlier
+    profiles are replaced by unused ids.
+    """
+
+    next_id: int = 1 + max(
+        [node["id"] for tree_json in tree_jsons for node in get_nodes(tree_json)],
+        default=0,
+    )
+    used_ids: set[int] = set()
+    merged_outputs: dict[str, dict] = {}
+    workspace_outputs: dict[str, str] = {}
+    for tree_json in tree_jsons:
+        tree_json = copy.deepcopy(tree_json)
+        nodes: list[dict] = get_nodes(tree_json)
+        for node in nodes:
+            if reassign_ids and node["id"] in used_ids:
+                node["id"] = next_id
+                next_id += 1
+        used_ids.update(node["id"] for node in nodes)
+
+        for output in tree_json["outputs"]:
+            if output["name"] not in merged_outputs:
+                merged_outputs[output["name"]] = {**output, "workspaces": []}
+            merged_output: dict = merged_outputs[output["name"]]
+            for key, value in output.items():
+                if key not in ["id", "workspaces"] and value is not None:
+                    merged_output[key] = value
+
+            for workspace in output["workspaces"]:
+                old_output_name: str | None = workspace_outputs.get(workspace["name"])
+                workspace_outputs[workspace["name"]] = output["name"]
+                if old_output_name is None:
+                    merged_output["workspaces"].append(workspace)
+                    continue
+                _logger.info(
+                    f"workspace {workspace['name']} of output {old_output_name} is replaced by a later profile"
+                )
+                old_workspaces: list[dict] = merged_outputs[old_output_name][
+                    "workspaces"
+                ]
+                index: int = [
+                    old_workspace["name"] for old_workspace in old_workspaces
+                ].index(workspace["name"])
+                if old_output_name == output["name"]:
+                    old_workspaces[index] = workspace
+                else:
+                    del old_workspaces[index]
+                    merged_output["workspaces"].append(workspace)
+
+    return {
+        "outputs": [
+            output
+            for output in merged_outputs.values()
+            if len(output["workspaces"]) > 0 or output["name"] == "__i3"
+        ]
+    }
@@ -0,0 +1,163 @@
+import datetime
+import json
+import logging
+import pathlib
+
+import another_swayrst.types as types
+
+_logger: logging.Logger = logging.getLogger(__name__)
+
+
+def get_history_file(profile_file: pathlib.Path) -> pathlib.Path:
+    """Return the path of the history file of a profile."""
+
+    return profile_file.with_name(f"{profile_file.stem}.history.json")
+
+
+def get_timestamp() -> str:
+    """Return the current time as timestamp for a revision."""
+
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def _get_workspaces(tree_json: dict) -> dict[tuple[str, str], dict]:
+    """Return a map of (output name, workspace name) to the workspace of a profile."""
+
+    return {
+        (output["name"], workspace["name"]): workspace
+        for output in tree_json["outputs"]
+        for workspace in output["workspaces"]
+    }
+
+
+def create_delta(
+    newer_tree_json: dict, older_tree_json: dict, revision: int, timestamp: str
+) -> types.ProfileRevision:
+    """Create the delta to recreate the older tree from the newer one.
+
+    The delta contains the outputs (with the names of their workspaces) and only the
+    workspaces of the older tree which differ from the newer tree.
+    """
+
+    newer_workspaces: dict[tuple[str, str], dict] = _get_workspaces(newer_tree_json)
+    outputs: list[dict] = []
+    workspaces: list[dict] = []
+    for output in older_tree_json["outputs"]:
+        output_delta: dict = {
+            key: value for key, value in output.items() if key != "workspaces"
+        }
+        output_delta["workspaces"] = [
+            workspace["name"] for workspace in output["workspaces"]
+        ]
+        outputs.append(output_delta)
+        for workspace in output["workspaces"]:
+            if newer_workspaces.get((output["name"], workspace["name"])) != workspace:
+                workspaces.append({"output": output["name"], "workspace": workspace})
+    return types.ProfileRevision(
+        revision=revision, timestamp=timestamp, outputs=outputs, workspaces=workspaces
+    )
+
+
+def apply_delta(newer_tree_json: dict, delta: types.ProfileRevision) -> dict:
+    """Recreate the older tree from the newer tree and the delta."""
+
+    workspaces: dict[tuple[str, str], dict] = _get_workspaces(newer_tree_json)
+    for workspace_delta in delta.workspaces:
+        workspaces[
+            (workspace_delta["output"], workspace_delta["workspace"]["name"])
+        ] = workspace_delta["workspace"]
+    outputs: list[dict] = []
+    for output_delta in delta.outputs:
+        output: dict = dict(output_delta)
+        output["workspaces"] = [
+            workspaces[(output_delta["name"], workspace_name)]
+            for workspace_name in output_delta["workspaces"]
+        ]
+        outputs.append(output)
+    return {"outputs": outputs}
+
+
+def is_unchanged(delta: types.ProfileRevision, newer_tree_json: dict) -> bool:
+    """Check if the older tree of a delta is identical to the newer tree."""
+
+    if len(delta.workspaces) > 0:
+        return False
+    return (
+        delta.outputs == create_delta(newer_tree_json, newer_tree_json, 0, "").outputs
+    )
+
+
+def load_history(profile_file: pathlib.Path) -> types.ProfileHistory:
+    """Load the history of a profile, a profile without history is its only revision."""
+
+    history_file: pathlib.Path = get_history_file(profile_file)
+    if history_file.exists():
+        with history_file.open("r") as FILE:
+            return types.ProfileHistory.model_validate(json.load(FILE))
+    timestamp: str = get_timestamp()
+    if profile_file.exists():
+        timestamp = datetime.datetime.fromtimestamp(
+            profile_file.stat().st_mtime
+        ).isoformat(timespec="seconds")
+    return types.ProfileHistory(latest_timestamp=timestamp)
+
+
+def save_history(
+    profile_file: pathlib.Path, profile_history: types.ProfileHistory
+) -> None:
+    """Save the history of a profile."""
+
+    with get_history_file(profile_file).open("w") as FILE:
+        FILE.write(profile_history.model_dump_json(indent=2))
+
+
+def add_revision(
+    profile_file: pathlib.Path, old_tree_json: dict, new_tree_json: dict
+) -> int | None:
+    """Add the tree which is replaced in the profile file as delta to the history and return the new latest revision.
+
+    If the new tree equals the old one no revision is added and None is returned.
+    """
+
+    profile_history: types.ProfileHistory = load_history(profile_file)
+    delta: types.ProfileRevision = create_delta(
+        new_tree_json,
+        old_tree_json,
+        profile_history.latest_revision,
+        profile_history.latest_timestamp,
+    )
+    if is_unchanged(delta, new_tree_json):
+        _logger.info("profile unchanged -> no new revision created")
+        return None
+    profile_history.revisions.insert(0, delta)
+    profile_history.latest_revision += 1
+    profile_history.latest_timestamp = get_timestamp()
+    save_history(profile_file, profile_history)
+    return profile_history.latest_revision
+
+
+def get_revision(
+    profile_file: pathlib.Path, latest_tree_json: dict, revision: int
+) -> dict:
+    """Recreate a revision of a profile by applying the deltas to the latest tree."""
+
+    profile_history: types.ProfileHistory = load_history(profile_file)
+    if revision == profile_history.latest_revision:
+        return latest_tree_json
+    tree_json: dict = latest_tree_json
+    for delta in profile_history.revisions:
+        tree_json = apply_delta(tree_json, delta)
+        if delta.revision == revision:
+            return tree_json
+    raise KeyError(f"revision {revision} not found in history of {profile_file}")
+
+
+def prune(profile_file: pathlib.Path, keep: int) -> int:
+    """Remove all but the newest keep revisions (besides the latest) and return the number of removed revisions."""
+
+    profile_history: types.ProfileHistory = load_history(profile_file)
+    removed: int = max(len(profile_history.revisions) - keep, 0)
+    if removed > 0:
+        profile_history.revisions = profile_history.revisions[:keep]
+        save_history(profile_file, profile_history)
+    return removed
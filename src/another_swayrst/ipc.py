@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import socket
+import struct
+import typing
+
+import i3ipc
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_logger: logging.Logger = logging.getLogger(__name__)
+
+MAGIC: bytes = b"i3-ipc"
+HEADER_FORMAT: str = "=II"
+HEADER_SIZE: int = len(MAGIC) + struct.calcsize(HEADER_FORMAT)
+
+RUN_COMMAND: int = 0
+GET_OUTPUTS: int = 3
+GET_TREE: int = 4
+
+
+def decode_json(data: bytes) -> typing.Any:
+    """Decode a json document, orjson is used if it is installed."""
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def find_socket_path() -> str:
+    """Return the path of the ipc socket of the running sway or i3 instance."""
+
+    for variable in ["SWAYSOCK", "I3SOCK"]:
+        socket_path: str | None = os.environ.get(variable)
+        if socket_path is not None and os.path.exists(socket_path):
+            return socket_path
+    return i3ipc.Connection().socket_path
+
+
+class IpcConnection:
+    """Minimal client for the i3/sway ipc protocol.
+
+    The replies are decoded directly from json, no i3ipc objects are created.
+    """
+
+    def __init__(self, socket_path: str | None = None) -> None:
+        if socket_path is None:
+            socket_path = find_socket_path()
+        self.socket_path: str = socket_path
+        self.message_count: int = 0
+        self.command_count: int = 0
+        self.tree_bytes: int = 0
+        self._connect()
+
+    def _connect(self) -> None:
+        """Open the socket."""
+
+        self.__socket: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__socket.connect(self.socket_path)
+
+    def __receive(self, size: int) -> bytes:
+        """Read exactly size bytes from the socket."""
+
+        data = bytearray()
+        while len(data) < size:
+            chunk: bytes = self.__socket.recv(size - len(data))
+            if len(chunk) == 0:
+                raise ConnectionError(f"ipc socket {self.socket_path} closed")
+            data += chunk
+        return bytes(data)
+
+    def request(self, message_type: int, payload: str = "") -> bytes:
+        """Send a message and return the raw payload of the reply."""
+
+        self.message_count += 1
+        return self._exchange(message_type, payload)
+
+    def _exchange(self, message_type: int, payload: str) -> bytes:
+        """Send a message over the socket and read the raw payload of the reply."""
+
+        encoded_payload: bytes = payload.encode("utf-8")
+        self.__socket.sendall(
+            MAGIC
+            + struct.pack(HEADER_FORMAT, len(encoded_payload), message_type)
+            + encoded_payload
+        )
+        header: bytes = self.__receive(HEADER_SIZE)
+        if header[: len(MAGIC)] != MAGIC:
+            raise ConnectionError(f"invalid ipc reply from {self.socket_path}")
+        length, _ = struct.unpack(HEADER_FORMAT, header[len(MAGIC) :])
+        return self.__receive(length)
+
+    def command(self, payload: str) -> list[dict]:
+        """Run one or more commands and return a result for every command."""
+
+        replies: list[dict] = decode_json(self.request(RUN_COMMAND, payload))
+        self.command_count += len(replies)
+        return replies
+
+    def get_outputs(self) -> list[dict]:
+        """Return the data of all outputs."""
+
+        return decode_json(self.request(GET_OUTPUTS))
+
+    def get_tree(self) -> dict:
+        """Return the data of the layout tree."""
+
+        data: bytes = self.request(GET_TREE)
+        self.tree_bytes += len(data)
+        return decode_json(data)
+
+    def close(self) -> None:
+        """Close the connection."""
+
+        self.__socket.close()
@@ -0,0 +1,112 @@
+import logging
+
+_logger: logging.Logger = logging.getLogger(__name__)
+
+
+class LaunchTracker:
+    """Decides which missing apps are started, so a load never starts an unbounded number of processes.
+
+    Every missing window gets launch_budget launches. A command is started once for every
+    missing window which has no launch in flight, a launch is in flight until a window of
+    the command appeared or relaunch_after passed. A command is held back (only one launch
+    in flight) after a launch opened more than one window, like single instance apps which
+    open all their windows in one process, or after a launch opened no window. After the
+    deadline nothing is launched anymore.
+    """
+
+    def __init__(
+        self, launch_budget: int, relaunch_after: float, deadline: float
+    ) -> None:
+        self.__launch_budget: int = launch_budget
+        self.__relaunch_after: float = relaunch_after
+        self.__deadline: float = deadline
+        self.__launches: dict[str, int] = {}
+        self.__allowed_launches: dict[str, int] = {}
+        # command -> launch times of the launches without a window yet
+        self.__in_flight: dict[str, list[float]] = {}
+        # command -> missing windows at the last update
+        self.__missing: dict[str, int] = {}
+        # command -> time of the last launch or window of a held back command
+        self.__held_back: dict[str, float] = {}
+
+    def __update_in_flight(self, missing_apps: dict[str, int], now: float) -> None:
+        """Assign the new windows to the launches in flight and drop the launches which timed out."""
+
+        for cmd_str in set(self.__missing) | set(missing_apps):
+            amount: int = missing_apps.get(cmd_str, 0)
+            new_windows: int = self.__missing.get(cmd_str, amount) - amount
+            self.__missing[cmd_str] = amount
+            in_flight: list[float] = self.__in_flight.setdefault(cmd_str, [])
+            if new_windows > 0:
+                if new_windows > len(in_flight):
+                    if cmd_str not in self.__held_back:
+                        _logger.info(
+                            f"a launch of {cmd_str} opened several windows -> no parallel launches"
+                        )
+                    self.__held_back[cmd_str] = now
+                elif cmd_str in self.__held_back:
+                    self.__held_back[cmd_str] = now
+                del in_flight[:new_windows]
+            while len(in_flight) > 0 and now >= in_flight[0] + self.__relaunch_after:
+                if cmd_str not in self.__held_back:
+                    _logger.info(
+                        f"a launch of {cmd_str} opened no window -> no parallel launches"
+                    )
+                    self.__held_back[cmd_str] = in_flight[-1]
+                in_flight.pop(0)
+
+    def __is_in_flight(self, cmd_str: str, amount: int, now: float) -> bool:
+        """Check if every missing window of a command has a launch in flight."""
+
+        if cmd_str in self.__held_back:
+            return now < self.__held_back[cmd_str] + self.__relaunch_after
+        return len(self.__in_flight.get(cmd_str, [])) >= amount
+
+    def get_launches(self, missing_apps: dict[str, int], now: float) -> list[str]:
+        """Return the commands (of missing_apps, a map of command to missing windows) to launch now."""
+
+        self.__update_in_flight(missing_apps, now)
+        if now >= self.__deadline:
+            return []
+        launches: list[str] = []
+        for cmd_str, amount in missing_apps.items():
+            self.__allowed_launches[cmd_str] = max(
+                self.__allowed_launches.get(cmd_str, 0), amount * self.__launch_budget
+            )
+            if (
+                amount == 0
+                or self.__is_in_flight(cmd_str, amount, now)
+                or self.__launches.get(cmd_str, 0) >= self.__allowed_launches[cmd_str]
+            ):
+                continue
+            self.__launches[cmd_str] = self.__launches.get(cmd_str, 0) + 1
+            self.__in_flight[cmd_str].append(now)
+            if cmd_str in self.__held_back:
+                self.__held_back[cmd_str] = now
+            launches.append(cmd_str)
+        return launches
+
+    def is_finished(self, missing_apps: dict[str, int], now: float) -> bool:
+        """Check if all apps exist, the deadline passed or all launches are used up."""
+
+        self.__update_in_flight(missing_apps, now)
+        if now >= self.__deadline:
+            return True
+        for cmd_str, amount in missing_apps.items():
+            if amount > 0 and (
+                len(self.__in_flight.get(cmd_str, [])) > 0
+                or self.__is_in_flight(cmd_str, amount, now)
+                or self.__launches.get(cmd_str, 0)
+                < self.__allowed_launches.get(cmd_str, amount * self.__launch_budget)
+            ):
+                return False
+        return True
+
+    def report(self, missing_apps: dict[str, int]) -> None:
+        """Log the apps which couldn't be started."""
+
+        for cmd_str, amount in missing_apps.items():
+            if amount > 0:
+                _logger.warning(
+                    f"{amount} windows of {cmd_str} missing after {self.__launches.get(cmd_str, 0)} launches"
+                )
@@ -0,0 +1,129 @@
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import typing
+import uuid
+
+_logger: logging.Logger = logging.getLogger(__name__)
+
+# waiting requests of these actions are merged into the newest one, every save has to run
+COALESCED_ACTIONS: list[str] = ["load"]
+
+
+class LockBusy(Exception):
+    """Another run holds the lock of the session."""
+
+
+class Superseded(Exception):
+    """A newer request for the same action is waiting for the lock."""
+
+
+def get_lock_file(socket_path: str, fallback_dir: pathlib.Path) -> pathlib.Path:
+    """Return the lock file of the session of a socket, it is placed in $XDG_RUNTIME_DIR if it is set."""
+
+    runtime_dir: str | None = os.environ.get("XDG_RUNTIME_DIR")
+    lock_dir: pathlib.Path = fallback_dir
+    if runtime_dir is not None and os.path.isdir(runtime_dir):
+        lock_dir = pathlib.Path(runtime_dir).joinpath("another-swayrst")
+    session_name: str = pathlib.Path(socket_path).name.removesuffix(".sock")
+    return lock_dir.joinpath(f"{session_name}.lock")
+
+
+def get_pending_file(lock_file: pathlib.Path, action: str) -> pathlib.Path:
+    """Return the file of the newest waiting request of an action."""
+
+    return lock_file.with_name(f"{lock_file.stem}.{action}.pending")
+
+
+def _write_pending(
+    pending_file: pathlib.Path, request_id: str, profile_name: str
+) -> None:
+    """Replace the waiting request of an action atomically."""
+
+    file_descriptor, temporary_file = tempfile.mkstemp(
+        dir=pending_file.parent, prefix=f".{pending_file.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(file_descriptor, "w") as FILE:
+            json.dump({"id": request_id, "profile": profile_name}, FILE)
+        os.replace(temporary_file, pending_file)
+    except BaseException:
+        os.unlink(temporary_file)
+        raise
+
+
+def _read_pending(pending_file: pathlib.Path) -> dict | None:
+    """Return the waiting request of an action."""
+
+    try:
+        with pending_file.open("r") as FILE:
+            return json.load(FILE)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _wait_coalesced(
+    lock_handle: typing.IO,
+    lock_file: pathlib.Path,
+    action: str,
+    profile_name: str,
+    holder: str,
+) -> None:
+    """Register a request as the newest waiting request of its action and wait for the lock.
+
+    Superseded is raised if a newer request replaced it while it waited.
+    """
+
+    pending_file: pathlib.Path = get_pending_file(lock_file, action)
+    request_id: str = f"{os.getpid()}-{uuid.uuid4().hex}"
+    _write_pending(pending_file, request_id, profile_name)
+    _logger.info(f"waiting for the running {holder or 'unknown'} to finish")
+    fcntl.flock(lock_handle, fcntl.LOCK_EX)
+    pending: dict | None = _read_pending(pending_file)
+    if pending is None:
+        raise Superseded(
+            f"{action} of profile {profile_name} merged into a newer {action} which already ran"
+        )
+    if pending["id"] != request_id:
+        raise Superseded(
+            f"{action} of profile {profile_name} merged into the newer {action} of profile {pending['profile']}"
+        )
+    pending_file.unlink(missing_ok=True)
+
+
+@contextlib.contextmanager
+def single_flight(
+    lock_file: pathlib.Path, action: str, profile_name: str, wait: bool
+) -> typing.Iterator[None]:
+    """Hold the exclusive lock of a session while the body runs.
+
+    If the lock is held by another run LockBusy is raised, or with wait the request waits
+    for the lock. Requests of the COALESCED_ACTIONS are registered as the newest waiting
+    request of their action, waiting requests which are replaced by a newer one raise
+    Superseded when they get the lock, so all loads which arrive during a run are merged
+    into a single run of the newest one.
+    """
+
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with lock_file.open("a+") as FILE:
+        try:
+            fcntl.flock(FILE, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            FILE.seek(0)
+            holder: str = FILE.read().strip()
+            if not wait:
+                raise LockBusy(f"another run is in progress ({holder or 'unknown'})")
+            if action in COALESCED_ACTIONS:
+                _wait_coalesced(FILE, lock_file, action, profile_name, holder)
+            else:
+                _logger.info(f"waiting for the running {holder or 'unknown'} to finish")
+                fcntl.flock(FILE, fcntl.LOCK_EX)
+        FILE.seek(0)
+        FILE.truncate()
+        FILE.write(f"{action} of profile {profile_name}, pid {os.getpid()}")
+        FILE.flush()
+        yield
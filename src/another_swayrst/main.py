@@ -1,19 +1,34 @@
+import contextlib
+import copy
+import hashlib
 import json
 import logging
 import os
 import pathlib
+import shlex
 import subprocess
 import sys
 import time
+import typing
 
-import i3ipc
 import psutil
 import pydantic.tools
 
+import another_swayrst.compact_tree as compact_tree
+import another_swayrst.compose as compose
+import another_swayrst.history as history
+import another_swayrst.ipc as ipc
+import another_swayrst.launch as launch
+import another_swayrst.lock as lock
+import another_swayrst.metrics as metrics
+import another_swayrst.migration as migration
+import another_swayrst.recording as recording
 import another_swayrst.types as types
 
 _logger: logging.Logger = logging.getLogger(__name__)
 
+SCRIPT_CHECKSUM_PREFIX: str = "# restore checksum: "
+
 
 class AnotherSwayrst:
     def __init__(
@@ -24,10 +39,22 @@ class AnotherSwayrst:
         profile_dir: pathlib.Path | None,
         command_translation: tuple[tuple[str, str]] | None,
         respect_other_workspaces: bool | None,
+        prioritize_visible: bool | None = None,
+        launch_timeout: float | None = None,
+        max_fix_iterations: int | None = None,
+        on_concurrent_run: str | None = None,
+        restore_outputs: bool | None = None,
+        socket_path: str | None = None,
+        metrics_file: pathlib.Path | None = None,
+        record_file: pathlib.Path | None = None,
+        replay: recording.Replay | None = None,
+        offline: bool = False,
     ) -> None:
         self.__config_file: pathlib.Path | None = config_file
         config_file_name = "another-swayrst.conf"
-        possible_dirs: list[pathlib.Path] = self.__get_possible_conf_dirs()
+        possible_dirs: list[pathlib.Path] = []
+        if self.__config_file is None or not self.__config_file.exists():
+            possible_dirs = self.__get_possible_conf_dirs()
         if self.__config_file is None:
             for dir in possible_dirs:
                 self.__config_file = dir.joinpath(config_file_name)
@@ -72,82 +99,120 @@ class AnotherSwayrst:
                 )
         if respect_other_workspaces is not None:
             self._config.respect_other_workspaces = respect_other_workspaces
+        if prioritize_visible is not None:
+            self._config.start_missing_apps.prioritize_visible = prioritize_visible
+        if launch_timeout is not None:
+            self._config.start_missing_apps.launch_timeout = launch_timeout
+        if max_fix_iterations is not None:
+            self._config.verify.max_fix_iterations = max_fix_iterations
+        if restore_outputs is not None:
+            self._config.restore_outputs = restore_outputs
+        if on_concurrent_run is not None:
+            self._config.on_concurrent_run = on_concurrent_run  # type: ignore
+        if metrics_file is not None:
+            self._config.metrics_file = metrics_file
 
         if save_current_config:
             _logger.info(f"create config file: {self.__config_file}")
             with self.__config_file.open("w") as FILE:
                 FILE.write(self._config.model_dump_json(indent=2))
-        self.__i3ipc: i3ipc.Connection = i3ipc.Connection()
+        self.__socket_path: str | None = socket_path
+        self.__record_file: pathlib.Path | None = record_file
+        self.__recorder: recording.Recorder | None = None
+        self.__replay: recording.Replay | None = replay
+        self.__lookup_command: typing.Callable[[int], list[str]] = lambda pid: (
+            psutil.Process(pid).cmdline()
+        )
+        if replay is not None:
+            self.__ipc: ipc.IpcConnection = replay.connection
+            self.__lookup_command = replay.get_command
+        elif record_file is not None:
+            self.__recorder = recording.Recorder()
+            self.__ipc = recording.RecordingIpcConnection(socket_path, self.__recorder)
+            self.__lookup_command = self.__recorder.wrap_lookup(self.__lookup_command)
+        elif not offline:
+            self.__ipc = ipc.IpcConnection(socket_path)
+        # offline instances (history, check) only work on the profile files
+        self.__command_count: int = 0
+        self.__failed_command_count: int = 0
+        self.__launched_apps: int = 0
+        self.__metrics: metrics.Metrics = metrics.Metrics()
+        self.__process_cache: dict[int, list[str]] = {}
+        self.__clock_offset: float = 0.0
+
+    def __execute_commands(self, commands: list[str]) -> None:
+        """Execute a list of i3ipc commands in one batch and log possible error messages."""
+
+        if len(commands) == 0:
+            return
+        self.__command_count += len(commands)
+        replies: list[dict] = self.__ipc.command("; ".join(commands))
+        for command, reply in zip(commands, replies):
+            if not reply["success"]:
+                self.__failed_command_count += 1
+                _logger.error(
+                    f"error while executing ipc command {command}: {reply.get('error')}"
+                )
+        if len(replies) < len(commands):
+            # sway aborts a batch after an invalid command, i3 rejects the whole batch
+            not_executed: list[str] = commands[len(replies) :]
+            self.__failed_command_count += len(not_executed)
+            _logger.error(
+                f"{len(not_executed)} ipc commands not executed: {'; '.join(not_executed)}"
+            )
 
-    def __execute_command(self, command: str, app: i3ipc.Con | None = None) -> None:
+    def __execute_command(self, command: str) -> None:
         """Execute an i3ipc command and log possible error messages."""
 
-        con: i3ipc.Con | i3ipc.Connection = self.__i3ipc
-        if app is not None:
-            con = app
+        self.__execute_commands([command])
 
-        ret = con.command(command)
-        if not ret[0].success:  # type: ignore
-            _logger.error(
-                f"error while executing ipc command {command}: {ret[0].error}"  # type: ignore
-            )  # type: ignore
+    def __get_command(self, pid: int) -> list[str]:
+        """Return the command line of a process, the result is cached per pid."""
 
-    def __get_current_tree(self) -> types.Tree:
-        """Create a representation of the current window tree."""
+        if pid not in self.__process_cache:
+            self.__process_cache[pid] = self.__lookup_command(pid)
+        return self.__process_cache[pid]
 
-        tree: i3ipc.Con = self.__i3ipc.get_tree()
-        tree_data: dict = tree.ipc_data
+    def __get_current_tree(
+        self,
+        tree_data: dict | None = None,
+        include_workspace: typing.Callable[[str, str], bool] | None = None,
+    ) -> compact_tree.CompactTree:
+        """Create a representation of the current window tree, tree_data is fetched if it isn't given.
 
-        list_of_outputs: list[types.Output] = self.__parse_tree_output_elements(
-            tree_data["nodes"]
-        )
+        Only the workspaces for which include_workspace returns True are parsed.
+        """
 
-        return types.Tree(outputs=list_of_outputs)
+        if tree_data is None:
+            tree_data = self.__ipc.get_tree()
 
-    def __get_first_app_id(
-        self,
-        container: types.Container | types.AppContainer,
-        map_old_to_new_id: dict[int, int],
-    ) -> int | None:
-        """Depth first walk through a tree of containers and return the id of the first container which represent an application and which exist in the current tree."""
+        if (
+            include_workspace is None
+            and self._config.respect_other_workspaces
+            and hasattr(self, "_restore_tree")
+        ):
+            include_workspace = self.__workspace_in_restore_tree
 
-        if isinstance(container, types.AppContainer):
-            if container.id in map_old_to_new_id:
-                return map_old_to_new_id[container.id]
-        else:
-            for sub_container in container.sub_containers:
-                first_app_id = self.__get_first_app_id(sub_container, map_old_to_new_id)
-                if first_app_id is not None:
-                    return first_app_id
+        return compact_tree.CompactTree.from_ipc(
+            tree_data, self.__get_command, include_workspace
+        )
 
     def __get_map_of_apps(
-        self, tree: types.Tree
-    ) -> tuple[dict[int, types.AppContainer], dict[str, list[int]]]:
-        """Create a map of ID to app in given tree and a map of the command which was used to start a app to its ID."""
+        self, tree: compact_tree.CompactTree
+    ) -> tuple[dict[int, int], dict[str, list[int]]]:
+        """Create a map of ID to the index of the app in given tree and a map of the command which was used to start a app to its ID."""
 
-        map_id_app: dict[int, types.AppContainer] = {}
+        map_id_app: dict[int, int] = {}
         map_commands_id: dict[str, list[int]] = {}
 
-        for output in tree.outputs:
-            for workspace in output.workspaces:
-                map_apps_per_workspace: dict[int, types.AppContainer] = (
-                    self.__recursive_walk_through_container_tree(workspace.containers)
-                )
-                for app_id, app_container in map_apps_per_workspace.items():
-                    if app_id in map_id_app:
-                        _logger.warning(f"duplicate id found: {app_id}")
-                    map_id_app[app_id] = app_container
-                for container in workspace.floating_containers:
-                    if isinstance(container, types.AppContainer):
-                        if container.id in map_id_app:
-                            _logger.warning(f"duplicate id found: {container.id}")
-                        map_id_app[container.id] = container
-                    else:
-                        _logger.warning("other type than App in floating containers")
+        for index in tree.leaves:
+            id: int = tree.ids[index]
+            if id in map_id_app:
+                _logger.warning(f"duplicate id found: {id}")
+            map_id_app[id] = index
 
-        for id, container in map_id_app.items():
-            cmd: list[str] = container.command
-            cmd_str: str = " ".join(cmd)
+        for id, index in map_id_app.items():
+            cmd_str: str = " ".join(tree.commands[index])
             if cmd_str not in map_commands_id:
                 map_commands_id[cmd_str] = []
             map_commands_id[cmd_str].append(id)
@@ -172,37 +237,56 @@ class AnotherSwayrst:
                     missing_apps.append(
                         {
                             "amount": old_amount - new_amount,
-                            "cmd": self.__old_map_id_app[
-                                self.__old_map_cmd_ids[cmd_str][0]
-                            ].command,
+                            "cmd": self._restore_tree.commands[
+                                self.__old_map_id_app[old_ids[0]]
+                            ],
                         }
                     )
             else:
                 missing_apps.append(
                     {
                         "amount": old_amount,
-                        "cmd": self.__old_map_id_app[
-                            self.__old_map_cmd_ids[cmd_str][0]
-                        ].command,
+                        "cmd": self._restore_tree.commands[
+                            self.__old_map_id_app[old_ids[0]]
+                        ],
                     }
                 )
         return missing_apps
 
-    def __get_old_to_new_map(self) -> dict[int, int]:
-        """Create map of app id in old tree to app id in new tree."""
+    def __get_old_to_new_map(
+        self,
+        old_ids: typing.Container[int] | None = None,
+        known_map: dict[int, int] | None = None,
+        current_tree: compact_tree.CompactTree | None = None,
+    ) -> dict[int, int]:
+        """Create map of app id in old tree to app id in new tree.
+
+        Only the apps in old_ids are matched (all apps if None), apps of the new tree which
+        are already used in known_map are skipped. The current tree is fetched if it isn't given.
+        """
 
         map_old_to_new_id: dict[int, int] = {}
-        new_map_id_app, new_map_cmd_ids = self.__get_map_of_apps(
-            self.__get_current_tree()
-        )
+        if current_tree is None:
+            current_tree = self.__get_current_tree()
+        new_map_id_app, new_map_cmd_ids = self.__get_map_of_apps(current_tree)
+        if known_map is not None:
+            used_new_ids: set[int] = set(known_map.values())
+            for cmd in new_map_cmd_ids:
+                new_map_cmd_ids[cmd] = [
+                    new_id
+                    for new_id in new_map_cmd_ids[cmd]
+                    if new_id not in used_new_ids
+                ]
 
         for cmd, ids in self.__old_map_cmd_ids.items():
+            if old_ids is not None:
+                ids = [old_id for old_id in ids if old_id in old_ids]
             if cmd in new_map_cmd_ids:
                 matched_old_ids: set[int] = set()
                 for old_id in ids:
-                    old_title = self.__old_map_id_app[old_id].title
+                    old_title = self._restore_tree.names[self.__old_map_id_app[old_id]]
                     for new_id in new_map_cmd_ids[cmd]:
-                        new_title = new_map_id_app[new_id].title
+                        new_title = current_tree.names[new_map_id_app[new_id]]
                         if old_title == new_title:
                             map_old_to_new_id[old_id] = new_id
                             matched_old_ids.add(old_id)
@@ -249,295 +333,925 @@ class AnotherSwayrst:
         """Move all apps to scratchpad, create empty."""
 
         new_map_id_app, _ = self.__get_map_of_apps(self.__get_current_tree())
-        for id in new_map_id_app.keys():
-            app: i3ipc.Con | None = self.__i3ipc.get_tree().find_by_id(id)
-            if app is not None:
-                self.__execute_command(app=app, command="move scratchpad")
-
-    def __parse_tree_container_elements(
-        self, nodes
-    ) -> list[types.Container | types.AppContainer]:
-        """Iterate through all container elements in i3ipc-tree."""
-
-        return_element: list[types.Container | types.AppContainer] = []
-        for node in nodes:
-            if node["type"] not in ["con", "floating_con"]:
-                _logger.warning(f"Unexpected node type found: {node['type']}")
-            if len(node["nodes"]) == 0:
-                command: list[str] = psutil.Process(node["pid"]).cmdline()
-                container = types.AppContainer(
-                    id=node["id"],
-                    command=command,
-                    width=node["window_rect"]["width"],
-                    height=node["window_rect"]["height"],
-                    title=node["name"],
-                )
+        self.__execute_commands(
+            [f"[con_id={id}] move scratchpad" for id in new_map_id_app.keys()]
+        )
+
+    def __workspace_in_restore_tree(
+        self, output_name: str, workspace_name: str
+    ) -> bool:
+        """Check if workspace is in the tree to restore."""
+
+        for output in self._restore_tree.children[0]:
+            if self._restore_tree.names[output] == output_name:
+                for workspace in self._restore_tree.children[output]:
+                    if self._restore_tree.names[workspace] == workspace_name:
+                        return True
+        return False
+
+    def __get_mark(self, app_id: int) -> str:
+        """Return the temporary mark used to address an app while building the layout."""
+
+        return f"{compact_tree.MARK_PREFIX}{app_id}"
+
+    def __get_layout_command(self, app_id: int, layout: str) -> str | None:
+        """Return the command to set the layout of the parent of an app."""
+
+        if layout == "stacked":
+            layout = "stacking"
+        if layout not in ["splith", "splitv", "tabbed", "stacking"]:
+            return None
+        return f"[con_id={app_id}] layout {layout}"
+
+    def __get_sibling_commands(
+        self,
+        container: int,
+        workspace: int,
+        first_present: list[int],
+        map_old_to_new_id: dict[int, int],
+    ) -> list[str]:
+        """Return the command which gives the first app of a container a sibling before it is split.
+
+        Sway and i3 don't split the only child of a splith/splitv container but change the
+        layout of the container, so if the container is the only child of its parent another
+        app of the container is moved next to the first app. It is moved to its own place
+        when its level is built.
+        """
+
+        tree: compact_tree.CompactTree = self._restore_tree
+        parent: int = tree.parents[container]
+        if parent == workspace or any(
+            child != container and first_present[child] != -1
+            for child in tree.children[parent]
+        ):
+            return []
+        first_app_id: int = map_old_to_new_id[tree.ids[first_present[container]]]
+        for app in tree.apps(container):
+            if app != first_present[container] and tree.ids[app] in map_old_to_new_id:
+                return [
+                    f"[con_id={map_old_to_new_id[tree.ids[app]]}] move container to mark {self.__get_mark(first_app_id)}"
+                ]
+        _logger.info(
+            f"container {tree.ids[container]} and its parent hold only one app -> they can't be nested"
+        )
+        return []
+
+    def __get_split_commands(
+        self,
+        root: int,
+        workspace: int,
+        first_present: list[int],
+        map_old_to_new_id: dict[int, int],
+    ) -> list[str]:
+        """Create the commands which build the saved layout of root out of its marked apps.
+
+        The first app of root has to be at the place of root, the other apps anywhere on the
+        workspace. Every container is created by splitting its first app, afterwards the first
+        app of every other container of its split level is moved behind the first app of its
+        predecessor.
+        """
+
+        tree: compact_tree.CompactTree = self._restore_tree
+        commands: list[str] = []
+        stack: list[int] = [root]
+        while len(stack) > 0:
+            container: int = stack.pop()
+            first_app_id: int = map_old_to_new_id[tree.ids[first_present[container]]]
+            layout: str = tree.layouts[container]
+            layout_command: str | None = self.__get_layout_command(first_app_id, layout)
+            if container == workspace:
+                if layout_command is not None:
+                    commands.append(layout_command)
             else:
-                subcontainer: list[types.Container | types.AppContainer] = (
-                    self.__parse_tree_container_elements(node["nodes"])
+                commands += self.__get_sibling_commands(
+                    container, workspace, first_present, map_old_to_new_id
                 )
-                container = types.Container(
-                    id=node["id"],
-                    sub_containers=subcontainer,
-                    layout=node["layout"],
+                if layout == "splith":
+                    commands.append(f"[con_id={first_app_id}] splith")
+                else:
+                    commands.append(f"[con_id={first_app_id}] splitv")
+                    if layout != "splitv" and layout_command is not None:
+                        commands.append(layout_command)
+
+            level: list[int] = [
+                child
+                for child in tree.children[container]
+                if first_present[child] != -1
+            ]
+            for previous, child in zip(level, level[1:]):
+                previous_app_id: int = map_old_to_new_id[
+                    tree.ids[first_present[previous]]
+                ]
+                commands.append(
+                    f"[con_id={map_old_to_new_id[tree.ids[first_present[child]]]}] move container to mark {self.__get_mark(previous_app_id)}"
                 )
-            return_element.append(container)
-        return return_element
-
-    def __output_in_tree(self, output_name: str, tree: types.Tree) -> bool:
-        """Check if output is in tree."""
-        for output in tree.outputs:
-            if output.name == output_name:
-                return True
-        return False
+            stack += [
+                child
+                for child in reversed(level)
+                if tree.kinds[child] == compact_tree.KIND_CONTAINER
+            ]
+        return commands
+
+    def __get_workspace_layout_commands(
+        self,
+        output: int,
+        workspace: int,
+        first_present: list[int],
+        map_old_to_new_id: dict[int, int],
+    ) -> list[str]:
+        """Create the commands which build the saved layout of a workspace out of the apps in the scratchpad.
+
+        All tiled apps are moved to the workspace and marked, the layout is built by splits
+        and moves to the marks.
+        """
+
+        tree: compact_tree.CompactTree = self._restore_tree
+        workspace_number: int | None = tree.numbers[workspace]
+        commands: list[str] = []
+        app_ids: list[int] = [
+            map_old_to_new_id[tree.ids[app]]
+            for app in tree.tiled_apps(workspace)
+            if tree.ids[app] in map_old_to_new_id
+        ]
+        floating_app_ids: list[int] = [
+            map_old_to_new_id[tree.ids[app]]
+            for app in tree.floating_apps(workspace)
+            if tree.ids[app] in map_old_to_new_id
+        ]
+        if len(app_ids) + len(floating_app_ids) == 0:
+            return commands
 
-    def __parse_tree_output_elements(self, nodes) -> list[types.Output]:
-        """Iterate through all output elements in i3ipc-tree."""
+        for app_id in app_ids:
+            commands.append(
+                f"[con_id={app_id}] move container to workspace number {workspace_number}"
+            )
+            commands.append(f"[con_id={app_id}] floating off")
+            commands.append(f"[con_id={app_id}] mark --add {self.__get_mark(app_id)}")
 
-        return_element: list[types.Output] = []
-        for node in nodes:
-            if node["type"] != "output":
-                _logger.warning(f"Unexpected node type found: {node['type']}")
-            if self._config.respect_other_workspaces and hasattr(self, "_restore_tree"):
-                if not self.__output_in_tree(node["name"], self._restore_tree):
-                    continue
-            workspaces: list[types.Workspace] = self.__parse_tree_workspace_elements(
-                node["nodes"], node["name"]
+        if len(app_ids) > 0:
+            commands += self.__get_split_commands(
+                workspace, workspace, first_present, map_old_to_new_id
             )
-            output = types.Output(
-                id=node["id"], name=node["name"], workspaces=workspaces
+
+        for app_id in app_ids:
+            commands.append(f"[con_id={app_id}] unmark {self.__get_mark(app_id)}")
+
+        for app_id in floating_app_ids:
+            commands.append(
+                f"[con_id={app_id}] move container to workspace number {workspace_number}"
             )
-            return_element.append(output)
-        return return_element
 
-    def __workspace_in_tree(
-        self, workspace_name: str, output_name: str, tree: types.Tree
-    ) -> bool:
-        """Check if workspace is in tree."""
-        for output in tree.outputs:
-            if output.name == output_name:
-                for workspace in output.workspaces:
-                    if workspace.name == workspace_name:
-                        return True
-        return False
+        commands.append(f"workspace number {workspace_number}")
+        commands.append(f"move workspace to output {tree.names[output]}")
+        return commands
 
-    def __parse_tree_workspace_elements(
-        self, nodes, output_name: str
-    ) -> list[types.Workspace]:
-        """Iterate through all workspace elements in i3ipc-tree."""
+    def __get_node_ids(self, node: dict) -> set[int]:
+        """Return the ids of a node of the current tree and of all nodes below it."""
 
-        return_element: list[types.Workspace] = []
-        for node in nodes:
-            if node["type"] != "workspace":
-                _logger.warning(f"Unexpected node type found: {node['type']}")
+        node_ids: set[int] = set()
+        stack: list[dict] = [node]
+        while len(stack) > 0:
+            sub_node: dict = stack.pop()
+            node_ids.add(sub_node["id"])
+            stack += sub_node["nodes"]
+        return node_ids
 
-            if self._config.respect_other_workspaces and hasattr(self, "_restore_tree"):
-                if not self.__workspace_in_tree(
-                    node["name"], output_name, self._restore_tree
-                ):
+    def __get_rebuild_commands(
+        self,
+        workspace: int,
+        container: int,
+        node: dict,
+        first_present: list[int],
+        map_old_to_new_id: dict[int, int],
+    ) -> list[str]:
+        """Create the commands which rebuild a container of a workspace in place of its current node.
+
+        The first app of the container is swapped with the node, the other apps are moved out
+        of the node to the workspace, afterwards the layout of the container is built again.
+        """
+
+        tree: compact_tree.CompactTree = self._restore_tree
+        workspace_number: int | None = tree.numbers[workspace]
+        app_ids: list[int] = [
+            map_old_to_new_id[tree.ids[app]]
+            for app in tree.apps(container)
+            if tree.ids[app] in map_old_to_new_id
+        ]
+        first_app_id: int = map_old_to_new_id[tree.ids[first_present[container]]]
+        commands: list[str] = [f"[con_id={app_id}] floating off" for app_id in app_ids]
+        if node["id"] != first_app_id:
+            if first_app_id in self.__get_node_ids(node):
+                # an ancestor can't be swapped with its descendant
+                commands.append(
+                    f"[con_id={first_app_id}] move container to workspace number {workspace_number}"
+                )
+            commands.append(
+                f"[con_id={first_app_id}] swap container with con_id {node['id']}"
+            )
+        for app_id in app_ids:
+            if app_id != first_app_id:
+                commands.append(
+                    f"[con_id={app_id}] move container to workspace number {workspace_number}"
+                )
+            commands.append(f"[con_id={app_id}] mark --add {self.__get_mark(app_id)}")
+        commands += self.__get_split_commands(
+            container, workspace, first_present, map_old_to_new_id
+        )
+        for app_id in app_ids:
+            commands.append(f"[con_id={app_id}] unmark {self.__get_mark(app_id)}")
+        return commands
+
+    def __score_workspace(
+        self,
+        workspace: int,
+        workspace_node: dict | None,
+        first_present: list[int],
+        map_old_to_new_id: dict[int, int],
+        target_sizes: dict[int, tuple[int, int]],
+        fix_commands: list[str],
+    ) -> tuple[int, int, tuple[int, dict | None] | None]:
+        """Score how closely a workspace of the current tree matches a workspace of the profile.
+
+        Return the reached and the maximal score and the first container (in depth first order)
+        whose structure differs together with its current node or None if the structure
+        matches. The container is widened to its parents until it holds the same apps as
+        its node. Commands to fix the layout or size of matching nodes are added to fix_commands.
+        """
+
+        tree: compact_tree.CompactTree = self._restore_tree
+        tolerance: int = self._config.verify.size_tolerance
+        score: int = 0
+        max_score: int = 0
+        mismatch: tuple[int, dict | None] | None = None
+        matched_nodes: dict[int, dict | None] = {workspace: workspace_node}
+        stack: list[tuple[int, dict | None, dict | None]] = [
+            (workspace, workspace_node, None)
+        ]
+        while len(stack) > 0:
+            container, node, parent_node = stack.pop()
+            if tree.kinds[container] == compact_tree.KIND_APP:
+                new_id: int = map_old_to_new_id[tree.ids[container]]
+                max_score += 2
+                if node is None or node["id"] != new_id:
+                    if mismatch is None and node is not None:
+                        # the apps of the parent are in the wrong order
+                        mismatch = (tree.parents[container], parent_node)
                     continue
-            containers: list[types.Container | types.AppContainer] = (
-                self.__parse_tree_container_elements(node["nodes"])
-            )
-            floating_containers: list[types.Container | types.AppContainer] = (
-                self.__parse_tree_container_elements(node["floating_nodes"])
-            )
-            workspace_number: int | None = None
-            if "num" in node:
-                workspace_number = node["num"]
-            workspace = types.Workspace(
-                id=node["id"],
-                name=node["name"],
-                containers=containers,
-                floating_containers=floating_containers,
-                number=workspace_number,
-                layout=node["layout"],
-            )
-            return_element.append(workspace)
-        return return_element
-
-    def __recreate_containers(
+                score += 1
+                if new_id in target_sizes and tree.fullscreen_modes[container] == 0:
+                    width, height = target_sizes[new_id]
+                    if (
+                        abs(node["rect"]["width"] - width) <= tolerance
+                        and abs(node["rect"]["height"] - height) <= tolerance
+                    ):
+                        score += 1
+                    else:
+                        fix_commands += self.__get_resize_commands(
+                            {new_id: (width, height)}
+                        )
+                else:
+                    score += 1
+                continue
+
+            sub_containers: list[int] = [
+                child
+                for child in tree.children[container]
+                if first_present[child] != -1
+            ]
+            max_score += 2
+            if node is not None and len(node["nodes"]) == len(sub_containers):
+                matched_nodes[container] = node
+                score += 1
+                if node["layout"] == tree.layouts[container]:
+                    score += 1
+                else:
+                    layout_command: str | None = self.__get_layout_command(
+                        node["nodes"][0]["id"], tree.layouts[container]
+                    )
+                    if layout_command is not None:
+                        fix_commands.append(layout_command)
+                stack += reversed(
+                    [
+                        (sub_container, sub_node, node)
+                        for sub_container, sub_node in zip(
+                            sub_containers, node["nodes"]
+                        )
+                    ]
+                )
+            else:
+                if mismatch is None and (node is not None or container == workspace):
+                    mismatch = (container, node)
+                stack += [
+                    (sub_container, None, None) for sub_container in sub_containers
+                ]
+
+        if mismatch is not None:
+            # widen the mismatch until the container holds the same apps as its node
+            container, node = mismatch
+            present_ids: set[int] = set(map_old_to_new_id.values())
+            while container != workspace and node is not None:
+                app_ids: set[int] = {
+                    map_old_to_new_id[tree.ids[app]]
+                    for app in tree.tiled_apps(container)
+                    if tree.ids[app] in map_old_to_new_id
+                }
+                if app_ids == self.__get_node_ids(node) & present_ids:
+                    break
+                container = tree.parents[container]
+                node = matched_nodes[container]
+            mismatch = (container, node)
+        return score, max_score, mismatch
+
+    def __get_fix_structure_commands(
         self,
-        containers: list[types.Container | types.AppContainer],
-        workspace_number: int,
+        output: int,
+        workspace: int,
+        mismatch: tuple[int, dict | None],
+        first_present: list[int],
         map_old_to_new_id: dict[int, int],
-        layout: str,
+        target_sizes: dict[int, tuple[int, int]],
+    ) -> list[str]:
+        """Create the commands which rebuild the differing container of a workspace and restore the size and state of its apps.
+
+        If the workspace itself differs all of its apps are moved to the scratchpad and the
+        workspace is rebuilt, otherwise only the differing container is rebuilt in place.
+        """
+
+        tree: compact_tree.CompactTree = self._restore_tree
+        container, node = mismatch
+        app_ids: list[int] = [
+            map_old_to_new_id[tree.ids[app]]
+            for app in tree.tiled_apps(container)
+            if tree.ids[app] in map_old_to_new_id
+        ]
+        if container == workspace or node is None:
+            _logger.info(
+                f"structure of workspace {tree.names[workspace]} differs from profile -> rebuilding"
+            )
+            commands: list[str] = [
+                f"[con_id={app_id}] move scratchpad" for app_id in app_ids
+            ]
+            commands += self.__get_workspace_layout_commands(
+                output, workspace, first_present, map_old_to_new_id
+            )
+        else:
+            _logger.info(
+                f"structure of container {tree.ids[container]} on workspace {tree.names[workspace]} differs from profile -> rebuilding it"
+            )
+            commands = self.__get_rebuild_commands(
+                workspace, container, node, first_present, map_old_to_new_id
+            )
+        commands += self.__get_resize_commands(
+            {
+                app_id: target_sizes[app_id]
+                for app_id in app_ids
+                if app_id in target_sizes
+            }
+        )
+        state_commands, fullscreen_commands = self.__get_window_state_commands(
+            workspace, map_old_to_new_id
+        )
+        return commands + state_commands + fullscreen_commands
+
+    def __verify_workspaces(
+        self,
+        first_present: list[int],
+        map_old_to_new_id: dict[int, int],
+        target_sizes: dict[int, tuple[int, int]],
     ) -> None:
-        """width first walk through a given tree of Containers and recreate the layout defined by the tree."""
-
-        first_app = True
-        for container in containers[:1] + list(reversed(containers[1:])):
-            new_id: int | None = self.__get_first_app_id(container, map_old_to_new_id)
-            if new_id is not None:
-                app: i3ipc.Con | None = self.__i3ipc.get_tree().find_by_id(new_id)
-                if app is not None:
-                    if first_app:
-                        self.__execute_command(app=app, command="focus")
-                        self.__execute_command(app=app, command="split toggle")
-                        if layout == "stacked":
-                            layout = "stacking"
-                        self.__execute_command(app=app, command=f"layout {layout}")
-                        first_app = False
-                    else:
-                        self.__execute_command(
-                            app=app,
-                            command=f"move container to workspace number {workspace_number}",
+        """Compare the restored workspaces with the profile and fix the workspaces which differ.
+
+        Every iteration fetches the tree once. In workspaces with a wrong structure the first
+        differing container is rebuilt, for all other workspaces only the layout and size of the
+        differing containers are fixed. The fixes stop as soon as an iteration doesn't improve
+        the score.
+        """
+
+        tree: compact_tree.CompactTree = self._restore_tree
+        command_count_start: int = self.__command_count
+        max_fix_iterations: int = self._config.verify.max_fix_iterations
+        total_score: float = 1.0
+        previous_score: float | None = None
+        iteration: int = 0
+        while True:
+            workspace_nodes: dict[str, dict] = {}
+            for output_node in self.__ipc.get_tree()["nodes"]:
+                for workspace_node in output_node["nodes"]:
+                    workspace_nodes[workspace_node["name"]] = workspace_node
+
+            fix_commands: list[str] = []
+            score_sum: int = 0
+            max_score_sum: int = 0
+            for output in tree.children[0]:
+                if tree.names[output] == "__i3":
+                    continue
+                for workspace in tree.children[output]:
+                    if (
+                        tree.numbers[workspace] is None
+                        or first_present[workspace] == -1
+                    ):
+                        continue
+                    workspace_fix_commands: list[str] = []
+                    score, max_score, mismatch = self.__score_workspace(
+                        workspace,
+                        workspace_nodes.get(tree.names[workspace]),
+                        first_present,
+                        map_old_to_new_id,
+                        target_sizes,
+                        workspace_fix_commands,
+                    )
+                    if mismatch is not None:
+                        workspace_fix_commands = self.__get_fix_structure_commands(
+                            output,
+                            workspace,
+                            mismatch,
+                            first_present,
+                            map_old_to_new_id,
+                            target_sizes,
                         )
-                        self.__execute_command(app=app, command="floating off")
-
-        for container in containers:
-            if isinstance(container, types.Container):
-                self.__recreate_containers(
-                    containers=container.sub_containers,
-                    workspace_number=workspace_number,
-                    map_old_to_new_id=map_old_to_new_id,
-                    layout=container.layout,
+                    _logger.debug(
+                        f"workspace {tree.names[workspace]} matches with score {score}/{max_score}"
+                    )
+                    score_sum += score
+                    max_score_sum += max_score
+                    fix_commands += workspace_fix_commands
+
+            if max_score_sum > 0:
+                total_score = score_sum / max_score_sum
+            if len(fix_commands) == 0 or iteration >= max_fix_iterations:
+                break
+            if previous_score is not None and total_score <= previous_score:
+                _logger.info(
+                    f"fix iteration {iteration} didn't improve the score -> no more fixes"
+                )
+                break
+            previous_score = total_score
+            iteration += 1
+            _logger.debug(f"fix iteration {iteration}: {len(fix_commands)} commands")
+            self.__execute_commands(fix_commands)
+
+        log_level: int = logging.INFO
+        if (
+            total_score < self._config.verify.min_score
+            or self.__failed_command_count > 0
+        ):
+            log_level = logging.WARNING
+        _logger.log(
+            log_level,
+            f"restored layout matches profile with score {total_score:.2f} after {iteration} fix iterations, "
+            f"{self.__command_count} commands sent ({self.__command_count - command_count_start} for fixes, "
+            f"{self.__failed_command_count} failed)",
+        )
+
+    def __quote_argument(self, argument: str) -> str:
+        """Quote a command argument, so separators, spaces and quotes in it are kept."""
+
+        escaped: str = argument.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped}"'
+
+    def __get_window_state_commands(
+        self, workspace: int, map_old_to_new_id: dict[int, int]
+    ) -> tuple[list[str], list[str]]:
+        """Create the commands which restore the marks, sticky state and border of the apps of a workspace.
+
+        The fullscreen commands are returned separately, they have to be sent after the
+        layout and size of the workspace are restored.
+        """
+
+        tree: compact_tree.CompactTree = self._restore_tree
+        commands: list[str] = []
+        fullscreen_commands: list[str] = []
+        floating_apps: set[int] = set(tree.floating_apps(workspace))
+        for app in tree.apps(workspace):
+            if tree.ids[app] not in map_old_to_new_id:
+                continue
+            app_id: int = map_old_to_new_id[tree.ids[app]]
+            commands += [
+                f"[con_id={app_id}] mark --add {self.__quote_argument(mark)}"
+                for mark in tree.marks[app]
+            ]
+            if app in floating_apps and tree.sticky[app] is not None:
+                commands.append(
+                    f"[con_id={app_id}] sticky {'enable' if tree.sticky[app] else 'disable'}"
+                )
+            border: str | None = tree.borders[app]
+            if border in ["normal", "pixel"] and tree.border_widths[app] is not None:
+                commands.append(
+                    f"[con_id={app_id}] border {border} {tree.border_widths[app]}"
                 )
+            elif border is not None:
+                commands.append(f"[con_id={app_id}] border {border}")
+            if tree.fullscreen_modes[app] == 1:
+                fullscreen_commands.append(f"[con_id={app_id}] fullscreen enable")
+            elif tree.fullscreen_modes[app] == 2:
+                fullscreen_commands.append(
+                    f"[con_id={app_id}] fullscreen enable global"
+                )
+        return commands, fullscreen_commands
 
-    def __recreate_workspaces(self) -> None:
-        """Recreate workspace layout and application sizes."""
+    def __get_restorable_workspaces(self) -> list[tuple[int, int]]:
+        """Return the output and workspace of every workspace of the profile which could be restored."""
 
-        map_old_to_new_id: dict[int, int] = self.__get_old_to_new_map()
-        for output in self._restore_tree.outputs:
-            if output.name != "__i3":
-                for workspace in output.workspaces:
-                    if workspace.number is None:
+        tree: compact_tree.CompactTree = self._restore_tree
+        workspaces: list[tuple[int, int]] = []
+        for output in tree.children[0]:
+            if tree.names[output] != "__i3":
+                for workspace in tree.children[output]:
+                    if tree.numbers[workspace] is None:
                         _logger.warning("workspace without number found")
                     else:
-                        for container in workspace.containers[:1] + list(
-                            reversed(workspace.containers[1:])
-                        ):
-                            new_id: int | None = self.__get_first_app_id(
-                                container, map_old_to_new_id
-                            )
-                            if new_id is not None:
-                                app: i3ipc.Con | None = (
-                                    self.__i3ipc.get_tree().find_by_id(new_id)
-                                )
-                                if app is not None:
-                                    self.__execute_command(
-                                        app=app,
-                                        command=f"move container to workspace number {workspace.number}",
-                                    )
-                                    self.__execute_command(
-                                        app=app, command="floating off"
-                                    )
-                                    layout: str = workspace.layout
-                                    if layout == "stacked":
-                                        layout = "stacking"
-                                    self.__execute_command(
-                                        app=app, command=f"layout {layout}"
-                                    )
-
-                        for container in workspace.containers:
-                            if isinstance(container, types.Container):
-                                self.__recreate_containers(
-                                    containers=container.sub_containers,
-                                    workspace_number=workspace.number,
-                                    map_old_to_new_id=map_old_to_new_id,
-                                    layout=container.layout,
-                                )
-                        for con in workspace.floating_containers:
-                            new_con_id: int = map_old_to_new_id[con.id]
-                            app = self.__i3ipc.get_tree().find_by_id(new_con_id)
-                            if app is not None:
-                                self.__execute_command(
-                                    app=app,
-                                    command=f"move container to workspace number {workspace.number}",
-                                )
-                        # move workspace to output
-                        self.__execute_command(
-                            app=None,
-                            command=f"move workspace to output {output.name}",
-                        )
+                        workspaces.append((output, workspace))
+        return workspaces
 
-                        # resize apps
-                        # map_old_to_new_id = self.__get_old_to_new_map()
-                        self.__resize_apps(workspace.containers, map_old_to_new_id)
-
-    def __recursive_walk_through_container_tree(
-        self, containers: list[types.Container | types.AppContainer]
-    ) -> dict[int, types.AppContainer]:
-        """Walk through container tree and return a map of the ID of an application to the corresponding container."""
-
-        map_id_app: dict[int, types.AppContainer] = {}
-        for container in containers:
-            if isinstance(container, types.AppContainer):
-                id: int = container.id
-                if id in map_id_app:
-                    _logger.warning(f"duplicate ID found: {id}")
-                map_id_app[id] = container
-            elif isinstance(container, types.Container):
-                sub_maps: dict[int, types.AppContainer] = (
-                    self.__recursive_walk_through_container_tree(
-                        container.sub_containers
-                    )
-                )
-                for key, value in sub_maps.items():
-                    if key in map_id_app:
-                        _logger.warning(f"duplicate ID found: {key}")
-                    map_id_app[key] = value
+    def __get_restore_commands(
+        self,
+        workspaces: list[tuple[int, int]],
+        map_old_to_new_id: dict[int, int],
+        output_sizes: dict[str, tuple[int, int]],
+        hide_apps: bool = False,
+        initial_commands: list[str] | None = None,
+        final_commands: list[str] | None = None,
+    ) -> tuple[list[str], dict[int, tuple[int, int]]]:
+        """Create the commands which recreate the layout and application sizes of workspaces and return them with the target sizes.
+
+        With hide_apps the apps of the workspaces are moved to the scratchpad first.
+        """
+
+        tree: compact_tree.CompactTree = self._restore_tree
+        first_present: list[int] = tree.get_first_present_apps(map_old_to_new_id)
+        commands: list[str] = list(initial_commands) if initial_commands else []
+        layout_commands: list[str] = []
+        state_commands: list[str] = []
+        fullscreen_commands: list[str] = []
+        target_sizes: dict[int, tuple[int, int]] = {}
+        for output, workspace in workspaces:
+            if hide_apps:
+                commands += [
+                    f"[con_id={map_old_to_new_id[tree.ids[app]]}] move scratchpad"
+                    for app in tree.apps(workspace)
+                    if tree.ids[app] in map_old_to_new_id
+                ]
+            layout_commands += self.__get_workspace_layout_commands(
+                output, workspace, first_present, map_old_to_new_id
+            )
+            workspace_state_commands, workspace_fullscreen_commands = (
+                self.__get_window_state_commands(workspace, map_old_to_new_id)
+            )
+            state_commands += workspace_state_commands
+            fullscreen_commands += workspace_fullscreen_commands
 
-        return map_id_app
+            # resize apps
+            target_sizes.update(
+                self.__get_target_sizes(
+                    output, workspace, map_old_to_new_id, output_sizes
+                )
+            )
+        return (
+            commands
+            + layout_commands
+            + self.__get_resize_commands(target_sizes)
+            + state_commands
+            + fullscreen_commands
+            + (final_commands if final_commands is not None else []),
+            target_sizes,
+        )
 
-    def __resize_apps(
+    def __restore_workspaces(
         self,
-        containers: list[types.Container | types.AppContainer],
+        workspaces: list[tuple[int, int]],
         map_old_to_new_id: dict[int, int],
-    ) -> None:
-        """Iterate through all apps and resize them to given size."""
-
-        for container in containers:
-            if isinstance(container, types.AppContainer):
-                if container.id in map_old_to_new_id:
-                    new_id: int = map_old_to_new_id[container.id]
-                    new_app: i3ipc.Con | None = self.__i3ipc.get_tree().find_by_id(
-                        new_id
-                    )
-                    current_height: int = new_app.window_rect.height  # type: ignore
-                    current_width: int = new_app.window_rect.width  # type: ignore
+        output_sizes: dict[str, tuple[int, int]],
+        hide_apps: bool = False,
+        initial_commands: list[str] | None = None,
+        final_commands: list[str] | None = None,
+    ) -> dict[int, tuple[int, int]]:
+        """Recreate the layout and application sizes of workspaces in one batch and return the target sizes."""
+
+        commands, target_sizes = self.__get_restore_commands(
+            workspaces,
+            map_old_to_new_id,
+            output_sizes,
+            hide_apps,
+            initial_commands,
+            final_commands,
+        )
+        self.__execute_commands(commands)
+        return target_sizes
+
+    def __recreate_workspaces(
+        self,
+    ) -> tuple[dict[int, int], dict[int, tuple[int, int]]]:
+        """Recreate workspace layout and application sizes, return the map of old to new app ids and the target sizes."""
+
+        map_old_to_new_id: dict[int, int] = self.__get_old_to_new_map()
+        self.__metrics.set_windows("matched", len(map_old_to_new_id))
+        self.__metrics.set_windows(
+            "unmatched", len(self.__old_map_id_app) - len(map_old_to_new_id)
+        )
+        output_commands, output_sizes = self.__get_outputs()
+        target_sizes: dict[int, tuple[int, int]] = self.__restore_workspaces(
+            self.__get_restorable_workspaces(),
+            map_old_to_new_id,
+            output_sizes,
+            initial_commands=output_commands,
+        )
+        self.__metrics.set_elapsed("time_to_visible_seconds")
+        return map_old_to_new_id, target_sizes
+
+    def __restore_prioritized(self) -> None:
+        """Restore the visible workspaces first and all other workspaces as soon as their apps exist.
+
+        The missing apps of the visible workspaces are started and awaited first, afterwards
+        the missing apps of all other workspaces are started at once and every workspace is
+        rearranged as soon as all of its apps exist. After launch_timeout the remaining
+        workspaces are restored with the apps which exist. Every restore batch first moves
+        all windows, which don't belong to a restored workspace, to the scratchpad.
+        """
+
+        tree: compact_tree.CompactTree = self._restore_tree
+        output_commands, output_sizes = self.__get_outputs()
+        visible_workspaces: list[int] = tree.get_visible_workspaces()
+        restorable_workspaces: list[tuple[int, int]] = (
+            self.__get_restorable_workspaces()
+        )
+        show_visible_commands: list[str] = [
+            f"workspace number {tree.numbers[workspace]}"
+            for workspace in visible_workspaces
+            if tree.numbers[workspace] is not None
+        ]
+        self.__execute_commands(output_commands + show_visible_commands[:1])
 
-                    if current_height < container.height:
-                        self.__execute_command(
-                            app=new_app,
-                            command=f"resize grow down {container.height - current_height}px",
+        tracker: launch.LaunchTracker = self.__get_launch_tracker()
+        map_old_to_new_id: dict[int, int] = {}
+        target_sizes: dict[int, tuple[int, int]] = {}
+        hidden_ids: set[int] = set()
+        for phase, pending in [
+            (
+                "restore_visible",
+                [
+                    item
+                    for item in restorable_workspaces
+                    if item[1] in visible_workspaces
+                ],
+            ),
+            (
+                "restore_background",
+                [
+                    item
+                    for item in restorable_workspaces
+                    if item[1] not in visible_workspaces
+                ],
+            ),
+        ]:
+            with self.__metrics.phase(phase):
+                while len(pending) > 0:
+                    pending_ids: set[int] = {
+                        tree.ids[app]
+                        for _, workspace in pending
+                        for app in tree.apps(workspace)
+                    }
+                    current_tree: compact_tree.CompactTree = self.__get_current_tree()
+                    pending_map: dict[int, int] = self.__get_old_to_new_map(
+                        pending_ids, map_old_to_new_id, current_tree
+                    )
+                    ready: list[tuple[int, int]] = []
+                    app_commands: dict[str, list[str]] = {}
+                    missing_amounts: dict[str, int] = {}
+                    for output, workspace in pending:
+                        workspace_missing_apps: list[int] = [
+                            app
+                            for app in tree.apps(workspace)
+                            if tree.ids[app] not in pending_map
+                        ]
+                        if len(workspace_missing_apps) == 0:
+                            ready.append((output, workspace))
+                        for app in workspace_missing_apps:
+                            cmd_str: str = " ".join(tree.commands[app])
+                            app_commands[cmd_str] = tree.commands[app]
+                            missing_amounts[cmd_str] = (
+                                missing_amounts.get(cmd_str, 0) + 1
+                            )
+                    now: float = self.__now()
+                    for cmd_str in tracker.get_launches(missing_amounts, now):
+                        self.__launch_app(app_commands[cmd_str])
+                    if len(ready) == 0 and tracker.is_finished(missing_amounts, now):
+                        tracker.report(missing_amounts)
+                        _logger.warning(
+                            "restoring the remaining workspaces without the missing apps"
                         )
-                    elif current_height > container.height:
-                        self.__execute_command(
-                            app=new_app,
-                            command=f"resize shrink down {current_height - container.height}px",
+                        ready = pending
+                    if len(ready) > 0:
+                        ready_ids: set[int] = {
+                            tree.ids[app]
+                            for _, workspace in ready
+                            for app in tree.apps(workspace)
+                        }
+                        map_old_to_new_id.update(
+                            {
+                                old_id: new_id
+                                for old_id, new_id in pending_map.items()
+                                if old_id in ready_ids
+                            }
                         )
-
-                    if current_width < container.width:
-                        self.__execute_command(
-                            app=new_app,
-                            command=f"resize grow right {container.width - current_width}px",
+                        _logger.debug(
+                            f"restoring workspaces {', '.join(tree.names[workspace] for _, workspace in ready)}"
                         )
-                    elif current_width > container.width:
-                        self.__execute_command(
-                            app=new_app,
-                            command=f"resize shrink right {current_width - container.width}px",
+                        restored_ids: set[int] = set(map_old_to_new_id.values())
+                        hide_ids: list[int] = [
+                            current_tree.ids[app]
+                            for app in current_tree.leaves
+                            if current_tree.ids[app] not in restored_ids
+                            and current_tree.ids[app] not in hidden_ids
+                        ]
+                        hidden_ids.update(hide_ids)
+                        target_sizes.update(
+                            self.__restore_workspaces(
+                                ready,
+                                map_old_to_new_id,
+                                output_sizes,
+                                hide_apps=True,
+                                initial_commands=[
+                                    f"[con_id={id}] move scratchpad" for id in hide_ids
+                                ],
+                                final_commands=show_visible_commands,
+                            )
                         )
+                        pending = [item for item in pending if item not in ready]
+                        continue
+                    self.__sleep(
+                        self._config.start_missing_apps.wait_time_after_command_start
+                    )
+            if phase == "restore_visible":
+                self.__metrics.set_elapsed("time_to_visible_seconds")
 
-            elif isinstance(container, types.Container):
-                self.__resize_apps(
-                    containers=container.sub_containers,
-                    map_old_to_new_id=map_old_to_new_id,
-                )
+        self.__metrics.set_windows("matched", len(map_old_to_new_id))
+        self.__metrics.set_windows(
+            "unmatched", len(self.__old_map_id_app) - len(map_old_to_new_id)
+        )
+        # hide the apps which appeared after the last restore batch
+        restored_ids = set(map_old_to_new_id.values())
+        other_app_ids: list[int] = [
+            id
+            for id in self.__get_map_of_apps(self.__get_current_tree())[0]
+            if id not in restored_ids and id not in hidden_ids
+        ]
+        self.__execute_commands(
+            [f"[con_id={id}] move scratchpad" for id in other_app_ids]
+        )
+        with self.__metrics.phase("verify"):
+            self.__verify_workspaces(
+                tree.get_first_present_apps(map_old_to_new_id),
+                map_old_to_new_id,
+                target_sizes,
+            )
+
+    def __get_output_configuration(
+        self, output: dict
+    ) -> types.OutputConfiguration | None:
+        """Return the configuration of an output of a GET_OUTPUTS reply, None for i3 or inactive outputs."""
+
+        mode: dict | None = output.get("current_mode")
+        if not output["active"] or mode is None:
+            return None
+        return types.OutputConfiguration(
+            width=mode["width"],
+            height=mode["height"],
+            refresh=mode.get("refresh"),
+            x=output["rect"]["x"],
+            y=output["rect"]["y"],
+            scale=output.get("scale", 1.0),
+            transform=output.get("transform", "normal"),
+        )
+
+    def __get_output_command(
+        self, name: str, configuration: types.OutputConfiguration
+    ) -> str:
+        """Return the command to apply the configuration of an output."""
+
+        mode: str = f"{configuration.width}x{configuration.height}"
+        if configuration.refresh is not None:
+            mode += f"@{configuration.refresh / 1000:.3f}Hz"
+        return (
+            f"output {name} mode {mode} pos {configuration.x} {configuration.y} "
+            f"scale {configuration.scale} transform {configuration.transform}"
+        )
+
+    def __get_logical_size(
+        self, configuration: types.OutputConfiguration
+    ) -> tuple[int, int]:
+        """Return the size of an output in the layout, after scaling and rotating."""
+
+        width: int = round(configuration.width / configuration.scale)
+        height: int = round(configuration.height / configuration.scale)
+        if configuration.transform.removeprefix("flipped-") in ["90", "270"]:
+            return height, width
+        return width, height
+
+    def __get_outputs(self) -> tuple[list[str], dict[str, tuple[int, int]]]:
+        """Return the commands to apply the saved output configurations and the logical size of every active output afterwards.
+
+        Only outputs whose configuration differs from the saved one are reconfigured.
+        """
+
+        output_commands: list[str] = []
+        output_sizes: dict[str, tuple[int, int]] = {}
+        for output in self.__ipc.get_outputs():
+            if not output["active"]:
+                continue
+            output_sizes[output["name"]] = (
+                output["rect"]["width"],
+                output["rect"]["height"],
+            )
+            saved_configuration: types.OutputConfiguration | None = (
+                self.__output_configurations.get(output["name"])
+            )
+            if (
+                not self._config.restore_outputs
+                or saved_configuration is None
+                or saved_configuration == self.__get_output_configuration(output)
+            ):
+                continue
+            output_commands.append(
+                self.__get_output_command(output["name"], saved_configuration)
+            )
+            output_sizes[output["name"]] = self.__get_logical_size(saved_configuration)
+        return output_commands, output_sizes
+
+    def __get_resize_commands(
+        self, target_sizes: dict[int, tuple[int, int]]
+    ) -> list[str]:
+        """Create the resize commands for a map of app id to its target size."""
+
+        return [
+            f"[con_id={app_id}] resize set width {width}px height {height}px"
+            for app_id, (width, height) in target_sizes.items()
+        ]
+
+    def __get_target_sizes(
+        self,
+        output: int,
+        workspace: int,
+        map_old_to_new_id: dict[int, int],
+        output_sizes: dict[str, tuple[int, int]],
+    ) -> dict[int, tuple[int, int]]:
+        """Create a map of the new app id to its target size, the sizes are scaled from the saved fractions to the current size of the output.
+
+        Profiles without fractions (or outputs with unknown size) fall back to the absolute size of the app.
+        """
+
+        tree: compact_tree.CompactTree = self._restore_tree
+        output_size: tuple[int | None, int | None] = output_sizes.get(
+            tree.names[output], (None, None)
+        )
+        target_sizes: dict[int, tuple[int, int]] = {}
+        stack: list[tuple[int, int | None, int | None]] = [
+            (workspace, output_size[0], output_size[1])
+        ]
+        while len(stack) > 0:
+            container, parent_width, parent_height = stack.pop()
+            width: int | None = None
+            height: int | None = None
+            width_fraction: float | None = tree.width_fractions[container]
+            height_fraction: float | None = tree.height_fractions[container]
+            if parent_width is not None and width_fraction is not None:
+                width = round(parent_width * width_fraction)
+            if parent_height is not None and height_fraction is not None:
+                height = round(parent_height * height_fraction)
+
+            if tree.kinds[container] == compact_tree.KIND_APP:
+                if tree.ids[container] in map_old_to_new_id:
+                    if width is None:
+                        width = tree.widths[container]
+                    if height is None:
+                        height = tree.heights[container]
+                    target_sizes[map_old_to_new_id[tree.ids[container]]] = (
+                        width,  # type: ignore
+                        height,  # type: ignore
+                    )
+            else:
+                stack += [
+                    (child, width, height)
+                    for child in tree.children[container]
+                    + tree.floating_children[container]
+                ]
+        return target_sizes
 
     def __set_profile(self, profile_name: str) -> None:
         """set the given profile to load/save."""
 
         self._profile_name: str = profile_name
-        self._profile_file: pathlib.Path = self._config.profile_dir.joinpath(
-            f"{profile_name}.json"
-        )
+        self._profile_file: pathlib.Path = self.__get_profile_file(profile_name)
+
+    def __get_profile_file(self, profile_name: str) -> pathlib.Path:
+        """Return the file of a profile."""
 
-    def __get_first_workspace(self, tree) -> types.Workspace | None:
-        """Return the first non '__i3' workspace in tree."""
-        for output in tree.outputs:
-            if output.name != "__i3":
-                for workspace in output.workspaces:
+        return self._config.profile_dir.joinpath(f"{profile_name}.json")
+
+    def __get_first_workspace(self, tree: compact_tree.CompactTree) -> int | None:
+        """Return the index of the first non '__i3' workspace in tree."""
+        for output in tree.children[0]:
+            if tree.names[output] != "__i3":
+                for workspace in tree.children[output]:
                     return workspace
 
     def __start_missing_apps(self) -> None:
@@ -547,70 +1261,444 @@ class AnotherSwayrst:
             first_workspace = self.__get_first_workspace(self._restore_tree)
             if first_workspace is not None:
                 self.__execute_command(
-                    app=None,
-                    command=f"workspace number {first_workspace.number}",
+                    f"workspace number {self._restore_tree.numbers[first_workspace]}"
                 )
+            tracker: launch.LaunchTracker = self.__get_launch_tracker()
             missing_apps: list[dict[str, int | list[str]]] = self.__get_missing_apps()
             while len(missing_apps) > 0:
-                app_info: dict[str, int | list[str]] = missing_apps[0]
-                cmd_org: list[str] = app_info["cmd"]  # type: ignore
-                cmd_new: list[str] = cmd_org.copy()
-                if cmd_org[0] in self._config.start_missing_apps.command_translation:
-                    cmd_new[0] = self._config.start_missing_apps.command_translation[
-                        cmd_org[0]
-                    ]
-                _logger.debug(f"starting App for {cmd_org} with command: {cmd_new}")
-                subprocess.Popen(cmd_new, cwd=pathlib.Path.home())
-                time.sleep(
+                app_commands: dict[str, list[str]] = {
+                    " ".join(app_info["cmd"]): app_info["cmd"]  # type: ignore
+                    for app_info in missing_apps
+                }
+                missing_amounts: dict[str, int] = {
+                    " ".join(app_info["cmd"]): app_info["amount"]  # type: ignore
+                    for app_info in missing_apps
+                }
+                now: float = self.__now()
+                for cmd_str in tracker.get_launches(missing_amounts, now):
+                    self.__launch_app(app_commands[cmd_str])
+                if tracker.is_finished(missing_amounts, now):
+                    tracker.report(missing_amounts)
+                    break
+                self.__sleep(
                     self._config.start_missing_apps.wait_time_after_command_start
                 )
                 missing_apps = self.__get_missing_apps()
 
-    def __check_output_exists(self, tree1: types.Tree, tree2: types.Tree) -> bool:
+    def __get_launch_tracker(self) -> launch.LaunchTracker:
+        """Create the tracker which limits the launches of missing apps of a load."""
+
+        return launch.LaunchTracker(
+            self._config.start_missing_apps.launch_budget,
+            self._config.start_missing_apps.relaunch_after,
+            self.__now() + self._config.start_missing_apps.launch_timeout,
+        )
+
+    def __launch_app(self, cmd_org: list[str]) -> None:
+        """Start an app with the (translated) command it was started with."""
+
+        cmd_new: list[str] = cmd_org.copy()
+        if cmd_org[0] in self._config.start_missing_apps.command_translation:
+            cmd_new[0] = self._config.start_missing_apps.command_translation[cmd_org[0]]
+        _logger.debug(f"starting App for {cmd_org} with command: {cmd_new}")
+        self.__launched_apps += 1
+        # during a replay the recorded trees already contain the started apps
+        if self.__replay is not None:
+            return
+        if self.__socket_path is None:
+            subprocess.Popen(cmd_new, cwd=pathlib.Path.home())
+        else:
+            # start the app inside the session of the given socket
+            self.__execute_command(f"exec {shlex.join(cmd_new)}")
+
+    def __now(self) -> float:
+        """Return the monotonic time, the waiting time of a replay is added."""
+
+        return time.monotonic() + self.__clock_offset
+
+    def __sleep(self, seconds: float) -> None:
+        """Wait for started apps, during a replay the waiting is only simulated."""
+
+        if self.__replay is None:
+            time.sleep(seconds)
+        else:
+            self.__clock_offset += seconds
+
+    def __check_output_exists(
+        self, tree1: compact_tree.CompactTree, tree2: compact_tree.CompactTree
+    ) -> bool:
         """Check if at least one common output exists in given trees."""
         output_names_tree_1: set[str] = set()
-        for output in tree1.outputs:
-            output_name = output.name
+        for output in tree1.children[0]:
+            output_name = tree1.names[output]
             if output_name != "__i3":
                 output_names_tree_1.add(output_name)
-        for output in tree2.outputs:
-            if output.name in output_names_tree_1:
+        for output in tree2.children[0]:
+            if tree2.names[output] in output_names_tree_1:
                 return True
         return False
 
-    def load(self, profile_name: str) -> None:
-        """Load an window tree from a json file and recreate the defined layout."""
+    def __get_session_file(self, file: pathlib.Path | None) -> pathlib.Path | None:
+        """Return the metrics/recording file of this session."""
 
-        self.__set_profile(profile_name=profile_name)
-
-        _logger.info(f"loading profile {self._profile_name} from {self._profile_file}")
-        if not self._profile_file.exists():
-            _logger.critical(
-                f"profile file: {self._profile_file} doesn't exists. -> Exiting"
+        if file is not None and self.__socket_path is not None:
+            session_name: str = pathlib.Path(self.__socket_path).name.removesuffix(
+                ".sock"
             )
-            sys.exit(1001)
+            file = file.with_name(f"{file.stem}-{session_name}{file.suffix}")
+        return file
+
+    def __write_recording(self, action: str) -> None:
+        """Write the recorded ipc session to the recording file."""
+
+        record_file: pathlib.Path | None = self.__get_session_file(self.__record_file)
+        if self.__recorder is None or record_file is None:
+            return
+        try:
+            self.__recorder.write(
+                record_file, action, self._config.model_dump(mode="json"), self.__ipc
+            )
+            _logger.info(f"ipc session recorded to {record_file}")
+        except OSError as e:
+            _logger.error(f"could not write recording {record_file}: {e}")
+
+    @contextlib.contextmanager
+    def __collect_metrics(
+        self, action: str, profile_name: str
+    ) -> typing.Iterator[None]:
+        """Collect the metrics of a save/load run and write them to the metrics file (and the recording)."""
+
+        self.__metrics = metrics.Metrics()
+        command_count_start: int = self.__command_count
+        failed_command_count_start: int = self.__failed_command_count
+        launched_apps_start: int = self.__launched_apps
+        message_count_start: int = self.__ipc.message_count
+        tree_bytes_start: int = self.__ipc.tree_bytes
+        success: bool = False
+        try:
+            yield
+            success = True
+        finally:
+            self.__write_recording(action)
+            metrics_file: pathlib.Path | None = self.__get_session_file(
+                self._config.metrics_file
+            )
+            if metrics_file is not None:
+                self.__metrics.set(
+                    "ipc_messages", self.__ipc.message_count - message_count_start
+                )
+                self.__metrics.set(
+                    "commands", self.__command_count - command_count_start
+                )
+                self.__metrics.set(
+                    "failed_commands",
+                    self.__failed_command_count - failed_command_count_start,
+                )
+                self.__metrics.set(
+                    "tree_bytes", self.__ipc.tree_bytes - tree_bytes_start
+                )
+                if action == "load":
+                    self.__metrics.set_windows(
+                        "launched", self.__launched_apps - launched_apps_start
+                    )
+                labels: dict[str, str] = {"action": action, "profile": profile_name}
+                if self.__socket_path is not None:
+                    labels["session"] = self.__socket_path
+                try:
+                    self.__metrics.write(metrics_file, labels, success)
+                except OSError as e:
+                    _logger.error(f"could not write metrics file {metrics_file}: {e}")
+
+    @contextlib.contextmanager
+    def __single_flight(self, action: str, profile_name: str) -> typing.Iterator[None]:
+        """Make sure only one save/load runs at a time in the session."""
+
+        if self.__replay is not None:
+            yield
+            return
+        lock_file: pathlib.Path = lock.get_lock_file(
+            self.__ipc.socket_path, self._config.profile_dir
+        )
+        try:
+            with lock.single_flight(
+                lock_file,
+                action,
+                profile_name,
+                wait=self._config.on_concurrent_run == "wait",
+            ):
+                yield
+        except lock.LockBusy as e:
+            _logger.critical(f"{e} -> Exiting")
+            sys.exit(1009)
+        except lock.Superseded as e:
+            _logger.warning(f"{e} -> Exiting")
+            sys.exit(0)
+
+    def load(
+        self,
+        profile_name: str,
+        revision: int | None = None,
+        additional_profiles: list[str] | None = None,
+    ) -> None:
+        """Load an window tree from a json file and recreate the defined layout.
+
+        The additional profiles are merged into the profile before it is restored.
+        """
+
+        profile_names: str = "+".join([profile_name] + (additional_profiles or []))
+        with self.__single_flight("load", profile_names):
+            with self.__collect_metrics("load", profile_names):
+                self.__load(profile_name, revision, additional_profiles or [])
+
+    def __read_profile_json(
+        self, profile_name: str, revision: int | None = None
+    ) -> dict:
+        """Read (a revision of) a profile and upgrade it to the current node version."""
+
+        profile_file: pathlib.Path = self.__get_profile_file(profile_name)
+        with profile_file.open("r") as FILE:
+            tree_json: dict = json.load(FILE)
+        if revision is not None:
+            _logger.info(f"recreating revision {revision} of profile {profile_name}")
+            try:
+                tree_json = history.get_revision(profile_file, tree_json, revision)
+            except KeyError as e:
+                _logger.critical(f"{e.args[0]} -> Exiting")
+                sys.exit(1006)
+        migrated_nodes: int = migration.migrate_tree_json(tree_json)
+        if migrated_nodes > 0:
+            _logger.info(
+                f"upgraded {migrated_nodes} nodes of profile {profile_name}, run 'check' to save the upgrade"
+            )
+        return tree_json
+
+    def __read_restore_tree(
+        self, revision: int | None, additional_profiles: list[str]
+    ) -> dict:
+        """Read (a revision of) the profile, merge the additional profiles into it and create the tree to restore.
 
-        with self._profile_file.open("r") as FILE:
-            restore_tree_json = json.load(FILE)
-        self._restore_tree: types.Tree = pydantic.tools.parse_obj_as(
+        Return the json of the merged profile.
+        """
+
+        restore_tree_json: dict = self.__read_profile_json(self._profile_name, revision)
+        if len(additional_profiles) > 0:
+            restore_tree_json = compose.merge_profiles(
+                [restore_tree_json]
+                + [self.__read_profile_json(name) for name in additional_profiles]
+            )
+        if self.__recorder is not None:
+            self.__recorder.record_profile(
+                "+".join([self._profile_name] + additional_profiles), restore_tree_json
+            )
+        restore_tree: types.Tree = pydantic.tools.parse_obj_as(
             types.Tree, restore_tree_json
         )
+        self.__output_configurations: dict[str, types.OutputConfiguration] = {
+            output.name: output.configuration
+            for output in restore_tree.outputs
+            if output.configuration is not None
+        }
+        self._restore_tree: compact_tree.CompactTree = (
+            compact_tree.CompactTree.from_profile(restore_tree)
+        )
+        return restore_tree_json
 
-        if not self.__check_output_exists(
-            self._restore_tree, self.__get_current_tree()
-        ):
+    def __check_profiles_exist(self, profile_names: list[str]) -> None:
+        """Exit if one of the profiles doesn't exist."""
+
+        for name in profile_names:
+            profile_file: pathlib.Path = self.__get_profile_file(name)
+            _logger.info(f"loading profile {name} from {profile_file}")
+            if not profile_file.exists():
+                _logger.critical(
+                    f"profile file: {profile_file} doesn't exists. -> Exiting"
+                )
+                sys.exit(1001)
+
+    def __load(
+        self, profile_name: str, revision: int | None, additional_profiles: list[str]
+    ) -> None:
+        """Load an window tree from a json file and recreate the defined layout."""
+
+        self.__set_profile(profile_name=profile_name)
+        self.__check_profiles_exist([profile_name] + additional_profiles)
+
+        with self.__metrics.phase("read_profile"):
+            self.__read_restore_tree(revision, additional_profiles)
+
+        with self.__metrics.phase("fetch_tree"):
+            current_tree: compact_tree.CompactTree = self.__get_current_tree()
+        if not self.__check_output_exists(self._restore_tree, current_tree):
             _logger.error("no common output name in restore profile and current system")
             sys.exit(1002)
 
         self.__old_map_id_app, self.__old_map_cmd_ids = self.__get_map_of_apps(
             self._restore_tree
         )
-        self.__start_missing_apps()
+        if (
+            self._config.start_missing_apps.active
+            and self._config.start_missing_apps.prioritize_visible
+        ):
+            self.__restore_prioritized()
+            return
+
+        with self.__metrics.phase("start_missing_apps"):
+            self.__start_missing_apps()
+
+        with self.__metrics.phase("move_to_scratchpad"):
+            self.__move_all_apps_to_scratchpad()
+        with self.__metrics.phase("recreate_workspaces"):
+            map_old_to_new_id, target_sizes = self.__recreate_workspaces()
+        with self.__metrics.phase("verify"):
+            self.__verify_workspaces(
+                self._restore_tree.get_first_present_apps(map_old_to_new_id),
+                map_old_to_new_id,
+                target_sizes,
+            )
+
+    def __get_script_checksum(self, tree_data: dict, restore_tree_json: dict) -> str:
+        """Return a checksum of everything a restore script depends on.
 
-        self.__move_all_apps_to_scratchpad()
-        self.__recreate_workspaces()
+        These are the windows and outputs of the session, the output configurations, the
+        resolved profile and the configuration which changes the restore commands.
+        """
+
+        output_configurations: dict[str, dict | None] = {}
+        for output in self.__ipc.get_outputs():
+            configuration: types.OutputConfiguration | None = (
+                self.__get_output_configuration(output)
+            )
+            output_configurations[output["name"]] = (
+                configuration.model_dump(mode="json")
+                if configuration is not None
+                else None
+            )
+        return hashlib.sha256(
+            json.dumps(
+                [
+                    compact_tree.get_tree_checksum(tree_data),
+                    output_configurations,
+                    restore_tree_json,
+                    {
+                        "respect_other_workspaces": self._config.respect_other_workspaces,
+                        "restore_outputs": self._config.restore_outputs,
+                    },
+                ],
+                sort_keys=True,
+            ).encode("utf-8")
+        ).hexdigest()
+
+    def __read_script_checksum(self, script_file: pathlib.Path) -> str | None:
+        """Return the checksum a restore script was compiled with."""
+
+        if not script_file.exists():
+            return None
+        with script_file.open("r") as FILE:
+            for line in FILE:
+                if line.startswith(SCRIPT_CHECKSUM_PREFIX):
+                    return line.removeprefix(SCRIPT_CHECKSUM_PREFIX).strip()
+        return None
+
+    def compile(
+        self,
+        profile_name: str,
+        script_file: pathlib.Path | None = None,
+        if_stale: bool = False,
+        additional_profiles: list[str] | None = None,
+    ) -> None:
+        """Resolve a profile against the current session and write the restore commands as swaymsg script.
+
+        The script contains the checksum of the session, the profile and the configuration
+        it was compiled with, with if_stale an existing script is only rebuilt if the
+        checksum differs.
+        """
+
+        additional_profiles = additional_profiles or []
+        profile_names: str = "+".join([profile_name] + additional_profiles)
+        self.__set_profile(profile_name=profile_name)
+        self.__check_profiles_exist([profile_name] + additional_profiles)
+        if script_file is None:
+            script_file = self._config.profile_dir.joinpath(
+                f"{profile_names}.swaymsg.sh"
+            )
 
-    def save(self, profile_name, workspaces: tuple[str]) -> None:
+        restore_tree_json: dict = self.__read_restore_tree(None, additional_profiles)
+        tree_data: dict = self.__ipc.get_tree()
+        checksum: str = self.__get_script_checksum(tree_data, restore_tree_json)
+        if if_stale and self.__read_script_checksum(script_file) == checksum:
+            _logger.info(f"restore script {script_file} is up to date")
+            return
+
+        current_tree: compact_tree.CompactTree = self.__get_current_tree(tree_data)
+        if not self.__check_output_exists(self._restore_tree, current_tree):
+            _logger.error("no common output name in restore profile and current system")
+            sys.exit(1002)
+        self.__old_map_id_app, self.__old_map_cmd_ids = self.__get_map_of_apps(
+            self._restore_tree
+        )
+        map_old_to_new_id: dict[int, int] = self.__get_old_to_new_map(
+            current_tree=current_tree
+        )
+        missing_windows: int = len(self.__old_map_id_app) - len(map_old_to_new_id)
+        if missing_windows > 0:
+            _logger.warning(
+                f"{missing_windows} windows of profile {profile_names} are not running, the script restores the layout without them"
+            )
+
+        output_commands, output_sizes = self.__get_outputs()
+        commands, _ = self.__get_restore_commands(
+            self.__get_restorable_workspaces(),
+            map_old_to_new_id,
+            output_sizes,
+            initial_commands=[
+                f"[con_id={id}] move scratchpad"
+                for id in self.__get_map_of_apps(current_tree)[0]
+            ]
+            + output_commands,
+        )
+        script_file.parent.mkdir(parents=True, exist_ok=True)
+        with script_file.open("w") as FILE:
+            FILE.write("#!/bin/sh\n")
+            FILE.write(f"# restore script of profile {profile_names}\n")
+            FILE.write(f"{SCRIPT_CHECKSUM_PREFIX}{checksum}\n")
+            FILE.write(f"exec swaymsg -- {shlex.quote('; '.join(commands))}\n")
+        script_file.chmod(0o755)
+        _logger.info(f"wrote {len(commands)} commands to {script_file}")
+
+    def save(self, profile_name, workspaces: tuple[str], update: bool = False) -> None:
+        """Save the current tree as a json file.
+
+        With update only the given (or all changed) workspaces are merged into the existing profile.
+        """
+
+        with self.__single_flight("save", profile_name):
+            with self.__collect_metrics("save", profile_name):
+                self.__save(profile_name, workspaces, update)
+
+    def __get_changed_workspaces(self, tree_data: dict, tree_json: dict) -> set[str]:
+        """Return the names of the workspaces of a GET_TREE reply which differ from a profile."""
+
+        profile_workspaces: dict[str, tuple[str, list[tuple]]] = {
+            workspace["name"]: (
+                output["name"],
+                compact_tree.get_workspace_signature_from_profile(workspace),
+            )
+            for output in tree_json["outputs"]
+            for workspace in output["workspaces"]
+        }
+        changed_workspaces: set[str] = set()
+        for output_node in tree_data["nodes"]:
+            for workspace_node in output_node["nodes"]:
+                if profile_workspaces.get(workspace_node["name"]) != (
+                    output_node["name"],
+                    compact_tree.get_workspace_signature_from_ipc(workspace_node),
+                ):
+                    changed_workspaces.add(workspace_node["name"])
+        return changed_workspaces
+
+    def __save(
+        self, profile_name, workspaces: tuple[str], update: bool = False
+    ) -> None:
         """Save the current tree as a json file."""
 
         self._config.profile_dir.mkdir(exist_ok=True)
@@ -620,38 +1708,147 @@ class AnotherSwayrst:
         if self._profile_file is None:
             _logger.critical("no profile set -> Exiting")
             sys.exit(1002)
+        old_tree_json: dict | None = None
         if self._profile_file.exists():
-            _logger.warning(
-                f"Profile {self._profile_name} already exists -> overwriting {self._profile_file}"
-            )
-        current_tree: types.Tree = self.__get_current_tree()
-        if workspaces is not None:
-            new_output_list: list[types.Output] = []
-            for output in current_tree.outputs:
-                if output.name == "__i3":
-                    new_output_list.append(output)
-                else:
-                    list_of_workspaces: list[types.Workspace] = []
-                    for workspace in output.workspaces:
-                        if len(workspaces) > 0:
-                            if workspace.name in workspaces:
-                                list_of_workspaces.append(workspace)
-                        else:
-                            list_of_workspaces.append(workspace)
-                    if len(list_of_workspaces) > 0:
-                        new_output = types.Output(
-                            id=output.id,
-                            version=output.version,
-                            name=output.name,
-                            workspaces=list_of_workspaces,
-                        )
-                        new_output_list.append(new_output)
+            try:
+                with self._profile_file.open("r") as FILE:
+                    profile_json: typing.Any = json.load(FILE)
+                if not isinstance(profile_json, dict) or not isinstance(
+                    profile_json.get("outputs"), list
+                ):
+                    raise ValueError("no outputs found")
+                old_tree_json = profile_json
+            except (ValueError, OSError) as e:  # json.JSONDecodeError is a ValueError
+                _logger.warning(
+                    f"Profile {self._profile_name} can't be read ({e}) -> overwriting {self._profile_file} without history"
+                )
+        base_tree_json: dict | None = None
+        if update:
+            if old_tree_json is None:
+                _logger.warning(
+                    f"profile {self._profile_name} not available -> saving all workspaces"
+                )
+            else:
+                base_tree_json = copy.deepcopy(old_tree_json)
+                migration.migrate_tree_json(base_tree_json)
+
+        with self.__metrics.phase("fetch_tree"):
+            tree_data: dict = self.__ipc.get_tree()
+            selected_workspaces: set[str] | None = None
+            if workspaces is not None and len(workspaces) > 0:
+                selected_workspaces = set(workspaces)
+            elif base_tree_json is not None:
+                selected_workspaces = self.__get_changed_workspaces(
+                    tree_data, base_tree_json
+                )
+                _logger.info(
+                    f"changed workspaces: {', '.join(sorted(selected_workspaces)) or 'none'}"
+                )
+
+            def include_workspace(output_name: str, workspace_name: str) -> bool:
+                if selected_workspaces is None:
+                    return True
+                if base_tree_json is None and output_name == "__i3":
+                    return True
+                return workspace_name in selected_workspaces
+
+            current_tree: types.Tree = self.__get_current_tree(
+                tree_data, include_workspace
+            ).to_profile()
+            output_configurations: dict[str, types.OutputConfiguration | None] = {
+                output["name"]: self.__get_output_configuration(output)
+                for output in self.__ipc.get_outputs()
+            }
+        for output in current_tree.outputs:
+            output.configuration = output_configurations.get(output.name)
+        if base_tree_json is not None:
+            current_tree = pydantic.tools.parse_obj_as(
+                types.Tree,
+                compose.merge_profiles(
+                    [base_tree_json, current_tree.model_dump(mode="json")],
+                    reassign_ids=False,
+                ),
+            )
+        elif workspaces is not None:
+            new_output_list: list[types.Output] = [
+                output
+                for output in current_tree.outputs
+                if output.name == "__i3" or len(output.workspaces) > 0
+            ]
             current_tree = types.Tree(outputs=new_output_list)
             if len(new_output_list) < 2:  # output __i3 always exists
                 _logger.error("no configured workspace found.")
 
-        with self._profile_file.open("w") as FILE:
-            FILE.write(current_tree.model_dump_json(indent=2))
+        with self.__metrics.phase("write_profile"):
+            if old_tree_json is not None:
+                latest_revision: int | None = history.add_revision(
+                    self._profile_file,
+                    old_tree_json,
+                    current_tree.model_dump(mode="json"),
+                )
+                if latest_revision is None:
+                    _logger.info(
+                        f"Profile {self._profile_name} unchanged -> {self._profile_file} not written"
+                    )
+                    return
+                _logger.warning(
+                    f"Profile {self._profile_name} already exists -> overwriting {self._profile_file} (revision {latest_revision}, older revisions are kept in the history)"
+                )
+
+            with self._profile_file.open("w") as FILE:
+                FILE.write(current_tree.model_dump_json(indent=2))
+
+    def show_history(self, profile_name: str, prune: int | None = None) -> None:
+        """Show the revisions of a profile and optionally remove old revisions."""
+
+        self.__set_profile(profile_name=profile_name)
+        if not self._profile_file.exists():
+            _logger.critical(
+                f"profile file: {self._profile_file} doesn't exists. -> Exiting"
+            )
+            sys.exit(1001)
+
+        if prune is not None:
+            removed: int = history.prune(self._profile_file, prune)
+            _logger.info(f"removed {removed} revisions of profile {self._profile_name}")
+
+        profile_history: types.ProfileHistory = history.load_history(self._profile_file)
+        print(
+            f"revision {profile_history.latest_revision}: {profile_history.latest_timestamp} (latest)"
+        )
+        for revision in profile_history.revisions:
+            changed_workspaces: str = ", ".join(
+                workspace_delta["workspace"]["name"]
+                for workspace_delta in revision.workspaces
+            )
+            print(
+                f"revision {revision.revision}: {revision.timestamp} (differs in workspaces: {changed_workspaces})"
+            )
+
+    def check(self, jobs: int | None = None, dry_run: bool = False) -> bool:
+        """Validate and upgrade all profiles in the profile directory, return if all profiles are valid."""
+
+        start: float = time.perf_counter()
+        results: list[types.ProfileCheckResult] = migration.check_profiles(
+            self._config.profile_dir, jobs, dry_run
+        )
+        for result in results:
+            if result.error is not None:
+                print(f"{result.profile}: ERROR {result.error}")
+                continue
+            migrated: str = ""
+            if result.migrated_nodes > 0:
+                action: str = "would upgrade" if dry_run else "upgraded"
+                migrated = f", {action} {result.migrated_nodes} nodes"
+            print(
+                f"{result.profile}: ok, {result.windows} windows, depth {result.depth}, "
+                f"{result.outputs} outputs, {result.workspaces} workspaces{migrated}"
+            )
+        failed: int = len([result for result in results if result.error is not None])
+        print(
+            f"checked {len(results)} profiles in {time.perf_counter() - start:.2f}s, {failed} with errors"
+        )
+        return failed == 0
 
     def show_config(self) -> None:
         print(f"configuration file: {self.__config_file}")
@@ -0,0 +1,120 @@
+import contextlib
+import os
+import pathlib
+import tempfile
+import time
+import typing
+
+PREFIX: str = "another_swayrst"
+
+HELP_TEXTS: dict[str, str] = {
+    "success": "1 if the last run finished successfully, otherwise 0.",
+    "last_run_timestamp_seconds": "Unix time of the end of the last run.",
+    "duration_seconds": "Duration of the last run.",
+    "phase_duration_seconds": "Duration of the phases of the last run.",
+    "ipc_messages": "Number of ipc messages sent in the last run.",
+    "commands": "Number of ipc commands executed in the last run.",
+    "failed_commands": "Number of failed ipc commands in the last run.",
+    "tree_bytes": "Bytes of tree data fetched in the last run.",
+    "windows": "Number of windows of the profile by state in the last run.",
+    "time_to_visible_seconds": "Time until the visible workspaces were restored in the last run.",
+}
+
+
+class Metrics:
+    """Collects the metrics of a save/load run and writes them as prometheus textfile."""
+
+    def __init__(self) -> None:
+        self.__start: float = time.perf_counter()
+        self.__phases: dict[str, float] = {}
+        self.__values: dict[str, float] = {}
+        self.__windows: dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        """Measure the duration of a phase, phases with the same name are summed up."""
+
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.__phases[name] = (
+                self.__phases.get(name, 0.0) + time.perf_counter() - start
+            )
+
+    def set(self, name: str, value: float) -> None:
+        """Set the value of a metric."""
+
+        self.__values[name] = value
+
+    def set_elapsed(self, name: str) -> None:
+        """Set the value of a metric to the time since the start of the run."""
+
+        self.__values[name] = time.perf_counter() - self.__start
+
+    def set_windows(self, state: str, value: int) -> None:
+        """Set the number of windows in a state (matched, unmatched, launched)."""
+
+        self.__windows[state] = value
+
+    def __format_labels(self, labels: dict[str, str]) -> str:
+        """Format labels in the prometheus text format."""
+
+        escaped_labels: list[str] = []
+        for key, value in labels.items():
+            value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+            escaped_labels.append(f'{key}="{value}"')
+        return "{" + ",".join(escaped_labels) + "}"
+
+    def format(self, labels: dict[str, str], success: bool) -> str:
+        """Return all metrics in the prometheus text format."""
+
+        samples: dict[str, list[tuple[dict[str, str], float]]] = {
+            "success": [(labels, 1 if success else 0)],
+            "last_run_timestamp_seconds": [(labels, time.time())],
+            "duration_seconds": [(labels, time.perf_counter() - self.__start)],
+            "phase_duration_seconds": [
+                ({**labels, "phase": phase}, duration)
+                for phase, duration in self.__phases.items()
+            ],
+            "windows": [
+                ({**labels, "state": state}, value)
+                for state, value in self.__windows.items()
+            ],
+        }
+        for name, value in self.__values.items():
+            samples[name] = [(labels, value)]
+
+        lines: list[str] = []
+        for name, metric_samples in samples.items():
+            if len(metric_samples) == 0:
+                continue
+            metric_name: str = f"{PREFIX}_{name}"
+            if name in HELP_TEXTS:
+                lines.append(f"# HELP {metric_name} {HELP_TEXTS[name]}")
+            lines.append(f"# TYPE {metric_name} gauge")
+            for sample_labels, value in metric_samples:
+                lines.append(
+                    f"{metric_name}{self.__format_labels(sample_labels)} {float(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def write(
+        self, metrics_file: pathlib.Path, labels: dict[str, str], success: bool
+    ) -> None:
+        """Write the metrics atomically, the file is replaced only after it is completely written."""
+
+        metrics_file.parent.mkdir(parents=True, exist_ok=True)
+        file_descriptor, temporary_file = tempfile.mkstemp(
+            dir=metrics_file.parent, prefix=f".{metrics_file.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(file_descriptor, "w") as FILE:
+                FILE.write(self.format(labels, success))
+                FILE.flush()
+                os.fsync(FILE.fileno())
+            os.chmod(temporary_file, 0o644)
+            os.replace(temporary_file, metrics_file)
+        except BaseException:
+            os.unlink(temporary_file)
+            raise
@@ -0,0 +1,112 @@
+import concurrent.futures
+import json
+import logging
+import os
+import pathlib
+
+import pydantic
+
+import another_swayrst.compact_tree as compact_tree
+import another_swayrst.compose as compose
+import another_swayrst.types as types
+
+_logger: logging.Logger = logging.getLogger(__name__)
+
+
+def _migrate_node_v1(node_json: dict) -> int:
+    """Upgrade a node from version 1 to 2 and return the number of migrated nodes.
+
+    Version 1 only stores the absolute size of the apps. The fractions of migrated nodes
+    stay unset, so their apps are restored with the absolute sizes.
+    """
+
+    if node_json.get("version", 1) < 2:
+        node_json["version"] = 2
+        return 1
+    return 0
+
+
+def migrate_tree_json(tree_json: dict) -> int:
+    """Upgrade all nodes of a profile to the current node version and return the number of migrated nodes."""
+
+    return sum(
+        _migrate_node_v1(node_json) for node_json in compose.get_nodes(tree_json)
+    )
+
+
+def check_profile(
+    profile_file: pathlib.Path, dry_run: bool = False
+) -> types.ProfileCheckResult:
+    """Validate a profile, upgrade old node versions in place and collect statistics."""
+
+    result = types.ProfileCheckResult(profile=profile_file.stem)
+    try:
+        with profile_file.open("r") as FILE:
+            tree_json: dict = json.load(FILE)
+        result.migrated_nodes = migrate_tree_json(tree_json)
+        tree: types.Tree = types.Tree.model_validate(tree_json)
+    except OSError as e:
+        result.error = f"can't read profile: {e!r}"
+        return result
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        # ValueError covers broken JSON and files which aren't UTF-8
+        result.error = f"invalid profile: {e!r}"
+        return result
+    except pydantic.ValidationError as e:
+        result.error = f"{e.error_count()} schema errors: " + "; ".join(
+            f"{'.'.join(str(location) for location in error['loc'])}: {error['msg']}"
+            for error in e.errors()[:5]
+        )
+        return result
+
+    tree_of_profile = compact_tree.CompactTree.from_profile(tree)
+    result.windows = len(tree_of_profile.leaves)
+    depths: list[int] = [0] * len(tree_of_profile)
+    for index in range(1, len(tree_of_profile)):
+        depths[index] = depths[tree_of_profile.parents[index]] + 1
+    # root, output and workspace are not counted
+    result.depth = max(max(depths) - 2, 0)
+    for output in tree_of_profile.children[0]:
+        if tree_of_profile.names[output] != "__i3":
+            result.outputs += 1
+            result.workspaces += len(tree_of_profile.children[output])
+
+    if result.migrated_nodes > 0 and not dry_run:
+        try:
+            with profile_file.open("w") as FILE:
+                FILE.write(tree.model_dump_json(indent=2))
+        except OSError as e:
+            result.error = f"can't write migrated profile: {e!r}"
+    return result
+
+
+def get_profile_files(profile_dir: pathlib.Path) -> list[pathlib.Path]:
+    """Return all profile files in a directory."""
+
+    return sorted(
+        profile_file
+        for profile_file in profile_dir.glob("*.json")
+        if not profile_file.name.endswith(".history.json")
+    )
+
+
+def check_profiles(
+    profile_dir: pathlib.Path, jobs: int | None = None, dry_run: bool = False
+) -> list[types.ProfileCheckResult]:
+    """Check all profiles of a directory with a process pool."""
+
+    profile_files: list[pathlib.Path] = get_profile_files(profile_dir)
+    if len(profile_files) == 0:
+        return []
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    chunksize: int = max(len(profile_files) // (4 * jobs), 1)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(
+            executor.map(
+                check_profile,
+                profile_files,
+                [dry_run] * len(profile_files),
+                chunksize=chunksize,
+            )
+        )
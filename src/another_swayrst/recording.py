@@ -0,0 +1,174 @@
+import collections
+import copy
+import json
+import logging
+import pathlib
+import time
+import typing
+
+import psutil
+
+import another_swayrst.ipc as ipc
+
+_logger: logging.Logger = logging.getLogger(__name__)
+
+RECORDING_VERSION: int = 1
+
+
+class Recorder:
+    """Records all ipc messages and process lookups of a run."""
+
+    def __init__(self) -> None:
+        self.__start: float = time.perf_counter()
+        self.events: list[dict] = []
+        self.profile_name: str | None = None
+        self.profile_data: dict | None = None
+
+    def record_ipc(self, message_type: int, payload: str, reply: bytes) -> None:
+        """Record an ipc request and its reply."""
+
+        self.events.append(
+            {
+                "kind": "ipc",
+                "type": message_type,
+                "payload": payload,
+                "reply": reply.decode("utf-8"),
+            }
+        )
+
+    def record_process(
+        self, pid: int, command: list[str] | None, error: str | None = None
+    ) -> None:
+        """Record the result of a process lookup."""
+
+        self.events.append(
+            {"kind": "process", "pid": pid, "command": command, "error": error}
+        )
+
+    def record_profile(self, profile_name: str, profile_data: dict) -> None:
+        """Record the profile which is restored."""
+
+        self.profile_name = profile_name
+        self.profile_data = copy.deepcopy(profile_data)
+
+    def wrap_lookup(
+        self, lookup: typing.Callable[[int], list[str]]
+    ) -> typing.Callable[[int], list[str]]:
+        """Return a process lookup which records every result of lookup."""
+
+        def recording_lookup(pid: int) -> list[str]:
+            try:
+                command: list[str] = lookup(pid)
+            except psutil.Error as e:
+                self.record_process(pid, None, type(e).__name__)
+                raise
+            self.record_process(pid, command)
+            return command
+
+        return recording_lookup
+
+    def write(
+        self,
+        recording_file: pathlib.Path,
+        action: str,
+        config: dict,
+        connection: ipc.IpcConnection,
+    ) -> None:
+        """Write the recording together with the configuration and a summary of the run."""
+
+        recording: dict = {
+            "version": RECORDING_VERSION,
+            "action": action,
+            "profile_name": self.profile_name,
+            "profile": self.profile_data,
+            "config": config,
+            "summary": {
+                "duration": time.perf_counter() - self.__start,
+                "ipc_messages": connection.message_count,
+                "commands": connection.command_count,
+                "tree_bytes": connection.tree_bytes,
+            },
+            "events": self.events,
+        }
+        recording_file.parent.mkdir(parents=True, exist_ok=True)
+        with recording_file.open("w") as FILE:
+            json.dump(recording, FILE)
+
+
+class RecordingIpcConnection(ipc.IpcConnection):
+    """Ipc connection which records every message and reply."""
+
+    def __init__(self, socket_path: str | None, recorder: Recorder) -> None:
+        self.__recorder: Recorder = recorder
+        super().__init__(socket_path)
+
+    def _exchange(self, message_type: int, payload: str) -> bytes:
+        reply: bytes = super()._exchange(message_type, payload)
+        self.__recorder.record_ipc(message_type, payload, reply)
+        return reply
+
+
+class ReplayIpcConnection(ipc.IpcConnection):
+    """Ipc connection which answers with the replies of a recording.
+
+    The replies are returned per message type in the recorded order. Commands which
+    differ from the recording are answered with success, tree and output requests
+    beyond the recording get the last recorded reply.
+    """
+
+    def __init__(self, events: list[dict]) -> None:
+        self.__replies: dict[int, collections.deque[dict]] = collections.defaultdict(
+            collections.deque
+        )
+        self.__last_replies: dict[int, bytes] = {}
+        for event in events:
+            if event["kind"] == "ipc":
+                self.__replies[event["type"]].append(event)
+        super().__init__("replay")
+
+    def _connect(self) -> None:
+        pass
+
+    def _exchange(self, message_type: int, payload: str) -> bytes:
+        replies: collections.deque[dict] = self.__replies[message_type]
+        if message_type == ipc.RUN_COMMAND:
+            if len(replies) > 0 and replies[0]["payload"] == payload:
+                return replies.popleft()["reply"].encode("utf-8")
+            _logger.debug(f"command not in recording: {payload}")
+            return json.dumps([{"success": True} for _ in payload.split("; ")]).encode(
+                "utf-8"
+            )
+        if len(replies) > 0:
+            self.__last_replies[message_type] = replies.popleft()["reply"].encode(
+                "utf-8"
+            )
+        if message_type not in self.__last_replies:
+            raise ConnectionError(f"no reply for message type {message_type} recorded")
+        return self.__last_replies[message_type]
+
+    def close(self) -> None:
+        pass
+
+
+class Replay:
+    """Source of ipc replies and process lookups for an offline run of a recording."""
+
+    def __init__(self, recording_file: pathlib.Path) -> None:
+        with recording_file.open("r") as FILE:
+            self.recording: dict = json.load(FILE)
+        if self.recording.get("version") != RECORDING_VERSION:
+            raise ValueError(f"unsupported recording version in {recording_file}")
+        self.__processes: dict[int, dict] = {}
+        for event in self.recording["events"]:
+            if event["kind"] == "process":
+                self.__processes[event["pid"]] = event
+        self.connection: ReplayIpcConnection = ReplayIpcConnection(
+            self.recording["events"]
+        )
+
+    def get_command(self, pid: int) -> list[str]:
+        """Return the recorded command line of a process."""
+
+        if pid not in self.__processes or self.__processes[pid]["command"] is None:
+            raise psutil.NoSuchProcess(pid)
+        return self.__processes[pid]["command"]
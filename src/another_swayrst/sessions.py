@@ -0,0 +1,91 @@
+import concurrent.futures
+import logging
+import pathlib
+import threading
+import time
+import typing
+
+import another_swayrst.main as main
+import another_swayrst.types as types
+
+_logger: logging.Logger = logging.getLogger(__name__)
+
+SOCKET_PATTERNS: list[str] = ["sway-ipc.*.sock", "ipc-socket.*"]
+
+
+def find_sockets(socket_dir: pathlib.Path) -> list[str]:
+    """Return the paths of all sway and i3 ipc sockets in a directory."""
+
+    socket_paths: set[str] = set()
+    for pattern in SOCKET_PATTERNS:
+        for path in socket_dir.glob(pattern):
+            if path.is_socket():
+                socket_paths.add(str(path))
+    return sorted(socket_paths)
+
+
+def get_session_name(socket_path: str) -> str:
+    """Return a short name of a session based on its socket path."""
+
+    return pathlib.Path(socket_path).name.removesuffix(".sock")
+
+
+def get_session_profile_name(
+    obj: main.AnotherSwayrst, profile_name: str, socket_path: str
+) -> str:
+    """Return the profile saved for the session of a socket, or the shared profile if there is none."""
+
+    session_profile_name: str = f"{profile_name}@{get_session_name(socket_path)}"
+    if obj._config.profile_dir.joinpath(f"{session_profile_name}.json").exists():
+        return session_profile_name
+    return profile_name
+
+
+def _run_session(
+    socket_path: str,
+    obj: main.AnotherSwayrst,
+    action: typing.Callable[[str, main.AnotherSwayrst], None],
+) -> types.SessionResult:
+    """Run an action for one session and measure its duration."""
+
+    threading.current_thread().name = get_session_name(socket_path)
+    start: float = time.perf_counter()
+    exit_code: int = 0
+    try:
+        action(socket_path, obj)
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else 1
+    except Exception:
+        _logger.exception(f"error while restoring session {socket_path}")
+        exit_code = 1
+    return types.SessionResult(
+        socket_path=socket_path,
+        exit_code=exit_code,
+        duration=time.perf_counter() - start,
+    )
+
+
+def run_sessions(
+    sessions: dict[str, main.AnotherSwayrst],
+    action: typing.Callable[[str, main.AnotherSwayrst], None],
+) -> list[types.SessionResult]:
+    """Run an action concurrently for all sessions, every session uses its own connection and process cache."""
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(sessions)) as executor:
+        futures = [
+            executor.submit(_run_session, socket_path, obj, action)
+            for socket_path, obj in sessions.items()
+        ]
+        return [future.result() for future in futures]
+
+
+def print_report(results: list[types.SessionResult], duration: float) -> None:
+    """Print the combined result and timing of all sessions."""
+
+    for result in results:
+        status: str = "ok" if result.exit_code == 0 else f"failed ({result.exit_code})"
+        print(f"{result.socket_path}: {status} in {result.duration:.2f}s")
+    failed: int = len([result for result in results if result.exit_code != 0])
+    print(
+        f"{len(results) - failed}/{len(results)} sessions finished successfully in {duration:.2f}s"
+    )
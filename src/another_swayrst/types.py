@@ -3,6 +3,8 @@ import typing
 
 import pydantic
 
+NODE_VERSION: int = 2
+
 
 class AnotherSwayrstConfigStartMissingApps(pydantic.BaseModel):
     """Configuration for the start of missing apps feature"""
@@ -10,6 +12,18 @@ class AnotherSwayrstConfigStartMissingApps(pydantic.BaseModel):
     active: bool = False
     wait_time_after_command_start: float = 1.1
     command_translation: dict[str, str] = {}
+    prioritize_visible: bool = False
+    launch_timeout: float = 30.0
+    launch_budget: int = 2
+    relaunch_after: float = 10.0
+
+
+class AnotherSwayrstConfigVerify(pydantic.BaseModel):
+    """Configuration for the verification of the restored layout"""
+
+    max_fix_iterations: int = 2
+    size_tolerance: int = 10
+    min_score: float = 1.0
 
 
 class AnotherSwayrstConfig(pydantic.BaseModel):
@@ -21,13 +35,17 @@ class AnotherSwayrstConfig(pydantic.BaseModel):
         AnotherSwayrstConfigStartMissingApps()
     )
     respect_other_workspaces: bool = False
+    verify: AnotherSwayrstConfigVerify = AnotherSwayrstConfigVerify()
+    metrics_file: pathlib.Path | None = None
+    on_concurrent_run: typing.Literal["wait", "exit"] = "wait"
+    restore_outputs: bool = True
 
 
 class TreeElement(pydantic.BaseModel):
     """Base class for all tree elements"""
 
     id: int
-    version: int = 1
+    version: int = NODE_VERSION
 
 
 class AppContainer(TreeElement):
@@ -37,6 +55,13 @@ class AppContainer(TreeElement):
     width: int
     height: int
     title: str
+    width_fraction: float | None = None
+    height_fraction: float | None = None
+    marks: list[str] = []
+    fullscreen_mode: int = 0  # 0: none, 1: output, 2: global
+    sticky: bool | None = None
+    border: str | None = None
+    border_width: int | None = None
 
 
 class Container(TreeElement):
@@ -44,6 +69,8 @@ class Container(TreeElement):
 
     sub_containers: list["Container| AppContainer"]
     layout: str
+    width_fraction: float | None = None
+    height_fraction: float | None = None
 
 
 class Workspace(TreeElement):
@@ -54,6 +81,20 @@ class Workspace(TreeElement):
     floating_containers: list[AppContainer | Container]
     number: int | None
     layout: str
+    width_fraction: float | None = None
+    height_fraction: float | None = None
+
+
+class OutputConfiguration(pydantic.BaseModel):
+    """Mode, position, scale and transform of an output."""
+
+    width: int
+    height: int
+    refresh: int | None = None
+    x: int
+    y: int
+    scale: float = 1.0
+    transform: str = "normal"
 
 
 class Output(TreeElement):
@@ -61,9 +102,51 @@ class Output(TreeElement):
 
     name: str
     workspaces: list[Workspace]
+    width: int | None = None
+    height: int | None = None
+    current_workspace: str | None = None
+    configuration: OutputConfiguration | None = None
 
 
 class Tree(pydantic.BaseModel):
     """Root node of the tree."""
 
     outputs: list[Output]
+
+
+class SessionResult(pydantic.BaseModel):
+    """Result of a save/load run on one sway/i3 session."""
+
+    socket_path: str
+    exit_code: int = 0
+    duration: float
+
+
+class ProfileRevision(pydantic.BaseModel):
+    """Delta to recreate an older revision of a profile from the next newer revision."""
+
+    revision: int
+    timestamp: str
+    outputs: list[dict]
+    workspaces: list[dict]
+
+
+class ProfileHistory(pydantic.BaseModel):
+    """History of a profile, the latest revision is the profile file itself."""
+
+    version: typing.Literal[1] = 1
+    latest_revision: int = 1
+    latest_timestamp: str
+    revisions: list[ProfileRevision] = []
+
+
+class ProfileCheckResult(pydantic.BaseModel):
+    """Result of the validation of a profile."""
+
+    profile: str
+    error: str | None = None
+    migrated_nodes: int = 0
+    windows: int = 0
+    depth: int = 0
+    outputs: int = 0
+    workspaces: int = 0
@@ -0,0 +1,235 @@
+import re
+
+CRITERIA: re.Pattern = re.compile(r"^\[con_id=(\d+)\] (.*)$")
+
+IGNORED_COMMANDS: list[str] = [
+    "resize ",
+    "workspace number ",
+    "move workspace to output ",
+    "output ",
+    "fullscreen ",
+    "sticky ",
+    "border ",
+    "floating off",
+]
+
+
+class FakeSway:
+    """In-memory window tree which applies the restore commands like sway does.
+
+    Only the commands the restore engine sends are supported. Like sway (and i3) a split of
+    the only child of a splith/splitv container changes the layout of the container instead
+    of creating a new one, empty containers are removed.
+    """
+
+    def __init__(self, app_ids: list[int], output_name: str = "DP-1") -> None:
+        self.__next_id: int = 1 + max(app_ids, default=0)
+        self.__parents: dict[int, dict] = {}
+        self.__nodes: dict[int, dict] = {
+            app_id: self.__app(app_id) for app_id in app_ids
+        }
+        self.output: dict = {
+            "id": self.__new_id(),
+            "type": "output",
+            "name": output_name,
+            "rect": self.__rect(),
+            "nodes": [],
+            "floating_nodes": [],
+        }
+        self.commands: list[str] = []
+        self.scale: float = 1.0
+
+    def __new_id(self) -> int:
+        self.__next_id += 1
+        return self.__next_id
+
+    def __rect(self) -> dict:
+        return {"x": 0, "y": 0, "width": 1000, "height": 1000}
+
+    def __app(self, app_id: int) -> dict:
+        return {
+            "id": app_id,
+            "type": "con",
+            "layout": "none",
+            "pid": app_id,
+            "name": f"app {app_id}",
+            "marks": [],
+            "rect": self.__rect(),
+            "window_rect": self.__rect(),
+            "nodes": [],
+            "floating_nodes": [],
+        }
+
+    def __get_workspace(self, number: int) -> dict:
+        for workspace in self.output["nodes"]:
+            if workspace["num"] == number:
+                return workspace
+        workspace: dict = {
+            "id": self.__new_id(),
+            "type": "workspace",
+            "name": str(number),
+            "num": number,
+            "layout": "splith",
+            "rect": self.__rect(),
+            "nodes": [],
+            "floating_nodes": [],
+        }
+        self.output["nodes"].append(workspace)
+        return workspace
+
+    def __attach(self, node: dict, parent: dict, index: int | None = None) -> None:
+        if index is None:
+            index = len(parent["nodes"])
+        parent["nodes"].insert(index, node)
+        self.__parents[node["id"]] = parent
+
+    def __detach(self, node: dict) -> None:
+        parent: dict | None = self.__parents.pop(node["id"], None)
+        if parent is None:
+            return
+        parent["nodes"].remove(node)
+        if parent["type"] == "con" and len(parent["nodes"]) == 0:
+            self.__detach(parent)
+
+    def __split(self, node: dict, layout: str) -> None:
+        parent: dict = self.__parents[node["id"]]
+        if len(parent["nodes"]) == 1 and parent["layout"] in ["splith", "splitv"]:
+            parent["layout"] = layout
+            return
+        container: dict = {
+            "id": self.__new_id(),
+            "type": "con",
+            "layout": layout,
+            "marks": [],
+            "rect": self.__rect(),
+            "nodes": [],
+            "floating_nodes": [],
+        }
+        index: int = parent["nodes"].index(node)
+        self.__detach(node)
+        self.__attach(container, parent, index)
+        self.__attach(node, container)
+
+    def __find_node(self, node_id: int) -> dict:
+        stack: list[dict] = [self.output]
+        while len(stack) > 0:
+            node: dict = stack.pop()
+            if node["id"] == node_id:
+                return node
+            stack += node["nodes"]
+        raise KeyError(node_id)
+
+    def __is_ancestor(self, node: dict, other: dict) -> bool:
+        parent: dict | None = self.__parents.get(other["id"])
+        while parent is not None:
+            if parent is node:
+                return True
+            parent = self.__parents.get(parent["id"])
+        return False
+
+    def __swap(self, node: dict, other: dict) -> None:
+        if self.__is_ancestor(node, other) or self.__is_ancestor(other, node):
+            raise ValueError("Cannot swap ancestor and descendant")
+        parent: dict = self.__parents[node["id"]]
+        other_parent: dict = self.__parents[other["id"]]
+        index: int = parent["nodes"].index(node)
+        other_index: int = other_parent["nodes"].index(other)
+        parent["nodes"][index] = other
+        other_parent["nodes"][other_index] = node
+        self.__parents[node["id"]] = other_parent
+        self.__parents[other["id"]] = parent
+
+    def __find_mark(self, mark: str) -> dict:
+        for node in self.__nodes.values():
+            if mark in node["marks"] and node["id"] in self.__parents:
+                return node
+        raise KeyError(mark)
+
+    def __run(self, command: str) -> None:
+        match = CRITERIA.match(command)
+        if match is None:
+            node: dict | None = None
+            action: str = command
+        else:
+            node = self.__nodes[int(match.group(1))]
+            action = match.group(2)
+        if any(action.startswith(ignored) for ignored in IGNORED_COMMANDS):
+            return
+        assert node is not None, command
+        if action.startswith("move container to workspace number "):
+            self.__detach(node)
+            self.__attach(node, self.__get_workspace(int(action.split()[-1])))
+        elif action == "move scratchpad":
+            self.__detach(node)
+        elif action.startswith("mark --add "):
+            node["marks"].append(action.split()[-1])
+        elif action.startswith("unmark "):
+            node["marks"].remove(action.split()[-1])
+        elif action.startswith("layout "):
+            layout: str = action.split()[-1]
+            self.__parents[node["id"]]["layout"] = (
+                "stacked" if layout == "stacking" else layout
+            )
+        elif action in ["splith", "splitv"]:
+            self.__split(node, action)
+        elif action.startswith("swap container with con_id "):
+            self.__swap(node, self.__find_node(int(action.split()[-1])))
+        elif action.startswith("move container to mark "):
+            target: dict = self.__find_mark(action.split()[-1])
+            self.__detach(node)
+            target_parent: dict = self.__parents[target["id"]]
+            self.__attach(node, target_parent, target_parent["nodes"].index(target) + 1)
+        else:
+            raise ValueError(f"unsupported command: {command}")
+
+    def command(self, payload: str) -> list[dict]:
+        """Run the commands of a batch."""
+
+        replies: list[dict] = []
+        for command in payload.split("; "):
+            self.commands.append(command)
+            self.__run(command)
+            replies.append({"success": True})
+        return replies
+
+    def get_tree(self) -> dict:
+        """Return the tree in the format of a GET_TREE reply."""
+
+        return {
+            "id": 1,
+            "type": "root",
+            "rect": self.__rect(),
+            "nodes": [self.output],
+            "floating_nodes": [],
+        }
+
+    def get_outputs(self) -> list[dict]:
+        """Return the output in the format of a GET_OUTPUTS reply."""
+
+        return [
+            {
+                "name": self.output["name"],
+                "active": True,
+                "current_mode": {
+                    "width": self.output["rect"]["width"],
+                    "height": self.output["rect"]["height"],
+                    "refresh": 60000,
+                },
+                "rect": self.output["rect"],
+                "scale": self.scale,
+                "transform": "normal",
+            }
+        ]
+
+    def get_structure(self, number: int) -> tuple:
+        """Return the layouts and app ids of a workspace as nested tuples."""
+
+        def get_node_structure(node: dict) -> tuple | int:
+            if node["type"] == "con" and len(node["nodes"]) == 0:
+                return node["id"]
+            return (
+                node["layout"],
+                tuple(get_node_structure(sub_node) for sub_node in node["nodes"]),
+            )
+
+        return get_node_structure(self.__get_workspace(number))  # type: ignore
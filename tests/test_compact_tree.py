@@ -0,0 +1,136 @@
+import copy
+import json
+import pathlib
+
+import pytest
+
+import another_swayrst.compact_tree as compact_tree
+import another_swayrst.migration as migration
+import another_swayrst.types as types
+
+PROFILE_DIR: pathlib.Path = pathlib.Path(__file__).parent.parent.joinpath(
+    "test-profiles"
+)
+
+
+def get_rect(width: int, height: int) -> dict:
+    return {"x": 0, "y": 0, "width": width, "height": height}
+
+
+def get_app_node(id: int, width: int, height: int, **state) -> dict:
+    """Return an app of a GET_TREE reply."""
+
+    return {
+        "id": id,
+        "type": "con",
+        "name": f"app {id}",
+        "layout": "none",
+        "pid": id,
+        "rect": get_rect(width, height),
+        "window_rect": get_rect(width, height),
+        "nodes": [],
+        "floating_nodes": [],
+        **state,
+    }
+
+
+def get_tree_data() -> dict:
+    """Return a GET_TREE reply with a nested layout and a floating app."""
+
+    workspace: dict = {
+        "id": 10,
+        "type": "workspace",
+        "name": "1",
+        "num": 1,
+        "layout": "splith",
+        "rect": get_rect(1000, 800),
+        "nodes": [
+            get_app_node(100, 600, 800, marks=["editor", "_another_swayrst_100"]),
+            {
+                "id": 20,
+                "type": "con",
+                "name": None,
+                "layout": "tabbed",
+                "rect": get_rect(400, 800),
+                "nodes": [
+                    get_app_node(101, 400, 800, border="pixel"),
+                    get_app_node(102, 400, 800, fullscreen_mode=1),
+                ],
+                "floating_nodes": [],
+            },
+        ],
+        "floating_nodes": [get_app_node(103, 300, 200, sticky=True)],
+    }
+    return {
+        "id": 1,
+        "type": "root",
+        "rect": get_rect(1000, 800),
+        "nodes": [
+            {
+                "id": 2,
+                "type": "output",
+                "name": "DP-1",
+                "current_workspace": "1",
+                "rect": get_rect(1000, 800),
+                "nodes": [workspace],
+            }
+        ],
+    }
+
+
+@pytest.mark.parametrize(
+    "profile_file", sorted(PROFILE_DIR.glob("*.json")), ids=lambda path: path.stem
+)
+def test_profile_round_trip(profile_file: pathlib.Path):
+    with profile_file.open("r") as FILE:
+        tree_json: dict = json.load(FILE)
+    migration.migrate_tree_json(tree_json)
+    tree: types.Tree = types.Tree.model_validate(tree_json)
+
+    assert compact_tree.CompactTree.from_profile(tree).to_profile() == tree
+
+
+def test_from_ipc():
+    tree = compact_tree.CompactTree.from_ipc(get_tree_data(), lambda pid: [f"app{pid}"])
+
+    workspace: int = tree.children[tree.children[0][0]][0]
+    assert [tree.ids[app] for app in tree.tiled_apps(workspace)] == [100, 101, 102]
+    assert [tree.ids[app] for app in tree.floating_apps(workspace)] == [103]
+    assert tree.get_visible_workspaces() == [workspace]
+    profile: types.Tree = tree.to_profile()
+    editor: types.AppContainer = profile.outputs[0].workspaces[0].containers[0]  # type: ignore
+    assert editor.marks == ["editor"]
+    assert editor.width_fraction == 0.6
+
+
+def test_include_workspace():
+    tree = compact_tree.CompactTree.from_ipc(
+        get_tree_data(), lambda pid: [], lambda output_name, workspace_name: False
+    )
+
+    assert len(tree.leaves) == 0
+    assert tree.to_profile().outputs[0].workspaces == []
+
+
+def test_workspace_signatures():
+    tree_data: dict = get_tree_data()
+    workspace_node: dict = tree_data["nodes"][0]["nodes"][0]
+    profile_json: dict = (
+        compact_tree.CompactTree.from_ipc(tree_data, lambda pid: [])
+        .to_profile()
+        .model_dump(mode="json")
+    )
+    workspace_json: dict = profile_json["outputs"][0]["workspaces"][0]
+
+    assert compact_tree.get_workspace_signature_from_ipc(
+        workspace_node
+    ) == compact_tree.get_workspace_signature_from_profile(workspace_json)
+
+    changed_layout: dict = copy.deepcopy(workspace_node)
+    changed_layout["nodes"][1]["layout"] = "splitv"
+    changed_state: dict = copy.deepcopy(workspace_node)
+    changed_state["nodes"][1]["nodes"][1]["fullscreen_mode"] = 0
+    for changed_node in [changed_layout, changed_state]:
+        assert compact_tree.get_workspace_signature_from_ipc(
+            changed_node
+        ) != compact_tree.get_workspace_signature_from_profile(workspace_json)
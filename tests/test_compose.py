@@ -0,0 +1,99 @@
+import another_swayrst.compose as compose
+
+
+def get_workspace(id: int, name: str, app_id: int, title: str) -> dict:
+    """Return a workspace with a single app."""
+
+    return {
+        "id": id,
+        "name": name,
+        "number": None,
+        "layout": "splith",
+        "containers": [
+            {
+                "id": app_id,
+                "command": ["foot"],
+                "width": 100,
+                "height": 100,
+                "title": title,
+            }
+        ],
+        "floating_containers": [],
+    }
+
+
+def get_ids(tree_json: dict) -> list[int]:
+    """Return the ids of all nodes of a profile."""
+
+    return [node["id"] for node in compose.get_nodes(tree_json)]
+
+
+def test_later_profiles_win():
+    base: dict = {
+        "outputs": [
+            {
+                "id": 1,
+                "name": "DP-1",
+                "width": 1920,
+                "height": 1080,
+                "workspaces": [
+                    get_workspace(10, "1", 100, "base 1"),
+                    get_workspace(11, "2", 101, "base 2"),
+                ],
+            }
+        ]
+    }
+    overlay: dict = {
+        "outputs": [
+            {
+                "id": 2,
+                "name": "DP-1",
+                "width": 2560,
+                "height": None,
+                "workspaces": [get_workspace(20, "2", 200, "overlay 2")],
+            },
+            {
+                "id": 3,
+                "name": "DP-2",
+                "workspaces": [get_workspace(21, "1", 201, "overlay 1")],
+            },
+        ]
+    }
+
+    merged: dict = compose.merge_profiles([base, overlay])
+
+    outputs: dict[str, dict] = {output["name"]: output for output in merged["outputs"]}
+    assert outputs["DP-1"]["width"] == 2560
+    assert outputs["DP-1"]["height"] == 1080
+    assert [
+        workspace["containers"][0]["title"]
+        for workspace in outputs["DP-1"]["workspaces"]
+    ] == ["overlay 2"]
+    assert [
+        workspace["containers"][0]["title"]
+        for workspace in outputs["DP-2"]["workspaces"]
+    ] == ["overlay 1"]
+
+
+def test_colliding_ids_are_reassigned():
+    first: dict = {
+        "outputs": [
+            {"id": 1, "name": "DP-1", "workspaces": [get_workspace(2, "1", 3, "a")]}
+        ]
+    }
+    second: dict = {
+        "outputs": [
+            {"id": 1, "name": "DP-2", "workspaces": [get_workspace(2, "2", 3, "b")]}
+        ]
+    }
+
+    merged: dict = compose.merge_profiles([first, second])
+
+    ids: list[int] = get_ids(merged)
+    assert len(ids) == len(set(ids))
+    assert get_ids(second) == [1, 2, 3]
+
+    merged_without_reassign: dict = compose.merge_profiles(
+        [first, second], reassign_ids=False
+    )
+    assert sorted(get_ids(merged_without_reassign)) == [1, 1, 2, 2, 3, 3]
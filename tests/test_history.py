@@ -0,0 +1,94 @@
+import json
+import pathlib
+
+import pytest
+
+import another_swayrst.history as history
+
+
+def get_profile(layouts: dict[str, str]) -> dict:
+    """Return a profile with one output and an app in every workspace."""
+
+    return {
+        "outputs": [
+            {
+                "id": 1,
+                "name": "DP-1",
+                "workspaces": [
+                    {
+                        "id": 10 + index,
+                        "name": name,
+                        "number": index,
+                        "layout": layout,
+                        "containers": [
+                            {
+                                "id": 100 + index,
+                                "command": ["foot"],
+                                "width": 100,
+                                "height": 100,
+                                "title": "foot",
+                            }
+                        ],
+                        "floating_containers": [],
+                    }
+                    for index, (name, layout) in enumerate(layouts.items(), 1)
+                ],
+            }
+        ]
+    }
+
+
+def test_delta_contains_only_changed_workspaces():
+    older: dict = get_profile({"1": "splith", "2": "splith"})
+    newer: dict = get_profile({"1": "splith", "2": "tabbed"})
+
+    delta = history.create_delta(newer, older, 1, "2024-01-01T00:00:00")
+
+    assert [
+        workspace_delta["workspace"]["name"] for workspace_delta in delta.workspaces
+    ] == ["2"]
+    assert history.apply_delta(newer, delta) == older
+
+
+def test_unchanged_tree_adds_no_revision(tmp_path: pathlib.Path):
+    profile_file: pathlib.Path = tmp_path.joinpath("work.json")
+    tree_json: dict = get_profile({"1": "splith"})
+
+    assert history.add_revision(profile_file, tree_json, tree_json) is None
+    assert not history.get_history_file(profile_file).exists()
+
+
+def test_rollback_to_older_revisions(tmp_path: pathlib.Path):
+    profile_file: pathlib.Path = tmp_path.joinpath("work.json")
+    revisions: list[dict] = [
+        get_profile({"1": "splith"}),
+        get_profile({"1": "splitv"}),
+        get_profile({"1": "tabbed", "2": "splith"}),
+    ]
+    for old_tree_json, new_tree_json in zip(revisions, revisions[1:]):
+        latest_revision = history.add_revision(
+            profile_file, old_tree_json, new_tree_json
+        )
+    assert latest_revision == 3
+    with profile_file.open("w") as FILE:
+        json.dump(revisions[-1], FILE)
+
+    for revision, tree_json in enumerate(revisions, 1):
+        assert history.get_revision(profile_file, revisions[-1], revision) == tree_json
+    with pytest.raises(KeyError):
+        history.get_revision(profile_file, revisions[-1], 4)
+
+
+def test_prune_keeps_newest_revisions(tmp_path: pathlib.Path):
+    profile_file: pathlib.Path = tmp_path.joinpath("work.json")
+    revisions: list[dict] = [
+        get_profile({"1": layout}) for layout in ["splith", "splitv", "tabbed"]
+    ]
+    for old_tree_json, new_tree_json in zip(revisions, revisions[1:]):
+        history.add_revision(profile_file, old_tree_json, new_tree_json)
+
+    assert history.prune(profile_file, 1) == 1
+    profile_history = history.load_history(profile_file)
+    assert [revision.revision for revision in profile_history.revisions] == [2]
+    assert history.get_revision(profile_file, revisions[-1], 2) == revisions[1]
+    assert history.prune(profile_file, 1) == 0
@@ -0,0 +1,88 @@
+import json
+import pathlib
+import socket
+import struct
+import threading
+
+import pytest
+
+import another_swayrst.ipc as ipc
+
+
+def serve(socket_path: pathlib.Path, replies: list[bytes]) -> list[tuple[int, bytes]]:
+    """Answer one message per reply on a unix socket and return the received messages.
+
+    The replies are sent in small chunks, so the client has to reassemble them.
+    """
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(socket_path))
+    server.listen(1)
+    messages: list[tuple[int, bytes]] = []
+
+    def receive(connection: socket.socket, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            data += connection.recv(size - len(data))
+        return data
+
+    def run() -> None:
+        connection, _ = server.accept()
+        with connection:
+            for reply in replies:
+                header: bytes = receive(connection, ipc.HEADER_SIZE)
+                length, message_type = struct.unpack(
+                    ipc.HEADER_FORMAT, header[len(ipc.MAGIC) :]
+                )
+                messages.append((message_type, receive(connection, length)))
+                for start in range(0, len(reply), 5):
+                    connection.sendall(reply[start : start + 5])
+        server.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    return messages
+
+
+def get_reply(message_type: int, data: object) -> bytes:
+    payload: bytes = json.dumps(data).encode("utf-8")
+    return (
+        ipc.MAGIC + struct.pack(ipc.HEADER_FORMAT, len(payload), message_type) + payload
+    )
+
+
+def test_messages_are_framed(tmp_path: pathlib.Path):
+    socket_path: pathlib.Path = tmp_path.joinpath("ipc.sock")
+    tree: dict = {"id": 1, "type": "root", "nodes": [], "name": "wörkspace"}
+    messages = serve(
+        socket_path,
+        [
+            get_reply(ipc.RUN_COMMAND, [{"success": True}, {"success": False}]),
+            get_reply(ipc.GET_TREE, tree),
+        ],
+    )
+    connection = ipc.IpcConnection(str(socket_path))
+
+    assert connection.command('[con_id=1] mark "ä"; [con_id=2] kill') == [
+        {"success": True},
+        {"success": False},
+    ]
+    assert connection.get_tree() == tree
+    connection.close()
+    assert connection.message_count == 2
+    assert connection.command_count == 2
+    assert connection.tree_bytes == len(json.dumps(tree))
+
+    assert messages == [
+        (ipc.RUN_COMMAND, '[con_id=1] mark "ä"; [con_id=2] kill'.encode("utf-8")),
+        (ipc.GET_TREE, b""),
+    ]
+
+
+def test_invalid_reply_raises(tmp_path: pathlib.Path):
+    socket_path: pathlib.Path = tmp_path.joinpath("ipc.sock")
+    serve(socket_path, [b"no-ipc" + struct.pack(ipc.HEADER_FORMAT, 0, ipc.GET_TREE)])
+    connection = ipc.IpcConnection(str(socket_path))
+
+    with pytest.raises(ConnectionError):
+        connection.get_tree()
+    connection.close()
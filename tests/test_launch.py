@@ -0,0 +1,62 @@
+from another_swayrst.launch import LaunchTracker
+
+
+def test_every_window_of_an_app_gets_a_launch():
+    tracker = LaunchTracker(launch_budget=2, relaunch_after=10.0, deadline=30.0)
+
+    assert tracker.get_launches({"foot": 4}, 0.0) == ["foot"]
+    assert tracker.get_launches({"foot": 4}, 1.0) == ["foot"]
+    assert tracker.get_launches({"foot": 3}, 2.0) == ["foot"]
+    assert tracker.get_launches({"foot": 2}, 3.0) == ["foot"]
+    assert tracker.get_launches({"foot": 1}, 4.0) == []
+    assert not tracker.is_finished({"foot": 1}, 4.0)
+    assert tracker.is_finished({"foot": 0}, 5.0)
+
+
+def test_single_instance_app_is_held_back():
+    tracker = LaunchTracker(launch_budget=2, relaunch_after=10.0, deadline=30.0)
+
+    assert tracker.get_launches({"firefox": 3}, 0.0) == ["firefox"]
+    # the launch opened two windows, the third appears later
+    assert tracker.get_launches({"firefox": 1}, 1.0) == []
+    assert tracker.get_launches({"firefox": 1}, 5.0) == []
+    assert not tracker.is_finished({"firefox": 1}, 5.0)
+    assert tracker.is_finished({"firefox": 0}, 6.0)
+
+
+def test_app_without_window_is_held_back():
+    tracker = LaunchTracker(launch_budget=2, relaunch_after=10.0, deadline=100.0)
+
+    assert tracker.get_launches({"foot": 2}, 0.0) == ["foot"]
+    assert tracker.get_launches({"foot": 2}, 1.0) == ["foot"]
+    # the first launch timed out -> one launch at a time
+    assert tracker.get_launches({"foot": 2}, 10.0) == []
+    assert tracker.get_launches({"foot": 2}, 20.0) == ["foot"]
+    assert tracker.get_launches({"foot": 2}, 25.0) == []
+
+
+def test_relaunch_after_timeout_within_budget():
+    tracker = LaunchTracker(launch_budget=2, relaunch_after=10.0, deadline=100.0)
+
+    assert tracker.get_launches({"foot": 1}, 0.0) == ["foot"]
+    assert tracker.get_launches({"foot": 1}, 5.0) == []
+    assert not tracker.is_finished({"foot": 1}, 5.0)
+    assert tracker.get_launches({"foot": 1}, 10.0) == ["foot"]
+    assert tracker.get_launches({"foot": 1}, 20.0) == []
+    assert tracker.is_finished({"foot": 1}, 20.0)
+
+
+def test_commands_are_launched_in_parallel():
+    tracker = LaunchTracker(launch_budget=1, relaunch_after=10.0, deadline=30.0)
+
+    assert tracker.get_launches({"foot": 1, "firefox": 1}, 0.0) == [
+        "foot",
+        "firefox",
+    ]
+
+
+def test_nothing_is_launched_after_the_deadline():
+    tracker = LaunchTracker(launch_budget=2, relaunch_after=10.0, deadline=30.0)
+
+    assert tracker.get_launches({"foot": 1}, 30.0) == []
+    assert tracker.is_finished({"foot": 1}, 30.0)
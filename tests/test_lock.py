@@ -0,0 +1,78 @@
+import pathlib
+import threading
+import time
+
+import pytest
+
+import another_swayrst.lock as lock
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    """Wait until condition returns True."""
+
+    end: float = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timeout"
+        time.sleep(0.01)
+
+
+def test_busy_lock_raises_without_wait(tmp_path: pathlib.Path):
+    lock_file: pathlib.Path = tmp_path.joinpath("session.lock")
+
+    with lock.single_flight(lock_file, "load", "work", wait=False):
+        with pytest.raises(lock.LockBusy):
+            with lock.single_flight(lock_file, "load", "home", wait=False):
+                pass
+
+    with lock.single_flight(lock_file, "load", "home", wait=False):
+        pass
+
+
+def test_waiting_requests_are_coalesced(tmp_path: pathlib.Path):
+    lock_file: pathlib.Path = tmp_path.joinpath("session.lock")
+    pending_file: pathlib.Path = lock.get_pending_file(lock_file, "load")
+    results: dict[str, str] = {}
+
+    def request(profile_name: str) -> None:
+        try:
+            with lock.single_flight(lock_file, "load", profile_name, wait=True):
+                results[profile_name] = "ran"
+        except lock.Superseded:
+            results[profile_name] = "superseded"
+
+    with lock.single_flight(lock_file, "load", "running", wait=False):
+        first = threading.Thread(target=request, args=("first",))
+        first.start()
+        wait_for(lambda: pending_file.exists())
+        second = threading.Thread(target=request, args=("second",))
+        second.start()
+        wait_for(lambda: "second" in pending_file.read_text())
+
+    first.join(5)
+    second.join(5)
+    assert results == {"first": "superseded", "second": "ran"}
+    assert not pending_file.exists()
+
+
+def test_waiting_saves_all_run(tmp_path: pathlib.Path):
+    lock_file: pathlib.Path = tmp_path.joinpath("session.lock")
+    results: list[str] = []
+
+    def request(profile_name: str) -> None:
+        with lock.single_flight(lock_file, "save", profile_name, wait=True):
+            results.append(profile_name)
+
+    with lock.single_flight(lock_file, "save", "running", wait=False):
+        requests: list[threading.Thread] = [
+            threading.Thread(target=request, args=(profile_name,))
+            for profile_name in ["work", "home"]
+        ]
+        for thread in requests:
+            thread.start()
+        time.sleep(0.2)
+        assert results == []
+
+    for thread in requests:
+        thread.join(5)
+    assert sorted(results) == ["home", "work"]
+    assert not lock.get_pending_file(lock_file, "save").exists()
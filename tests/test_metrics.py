@@ -0,0 +1,46 @@
+import pathlib
+
+import another_swayrst.metrics as metrics
+
+
+def get_samples(text: str) -> dict[str, float]:
+    """Return the samples of a prometheus textfile by name and labels."""
+
+    samples: dict[str, float] = {}
+    for line in text.splitlines():
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_format():
+    run_metrics = metrics.Metrics()
+    with run_metrics.phase("restore"):
+        pass
+    with run_metrics.phase("restore"):
+        pass
+    run_metrics.set("commands", 12)
+    run_metrics.set_windows("matched", 3)
+
+    text: str = run_metrics.format({"action": "load", "profile": 'a "b"\\c'}, False)
+
+    labels: str = 'action="load",profile="a \\"b\\"\\\\c"'
+    samples: dict[str, float] = get_samples(text)
+    assert samples[f"another_swayrst_success{{{labels}}}"] == 0.0
+    assert samples[f"another_swayrst_commands{{{labels}}}"] == 12.0
+    assert samples[f'another_swayrst_windows{{{labels},state="matched"}}'] == 3.0
+    assert f'another_swayrst_phase_duration_seconds{{{labels},phase="restore"}}' in (
+        samples
+    )
+    assert "# TYPE another_swayrst_commands gauge" in text.splitlines()
+    assert text.endswith("\n")
+
+
+def test_write_replaces_the_file(tmp_path: pathlib.Path):
+    metrics_file: pathlib.Path = tmp_path.joinpath("metrics", "swayrst.prom")
+    metrics.Metrics().write(metrics_file, {"action": "save"}, True)
+    metrics.Metrics().write(metrics_file, {"action": "load"}, True)
+
+    assert 'another_swayrst_success{action="load"} 1.0' in metrics_file.read_text()
+    assert [path.name for path in metrics_file.parent.iterdir()] == ["swayrst.prom"]
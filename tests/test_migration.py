@@ -0,0 +1,118 @@
+import json
+import pathlib
+
+import another_swayrst.migration as migration
+
+
+def get_v1_profile() -> dict:
+    """Return a profile saved with the first format version."""
+
+    return {
+        "outputs": [
+            {
+                "id": 1,
+                "version": 1,
+                "name": "DP-1",
+                "workspaces": [
+                    {
+                        "id": 10,
+                        "version": 1,
+                        "name": "1",
+                        "number": 1,
+                        "layout": "splith",
+                        "containers": [
+                            {
+                                "id": 20,
+                                "version": 1,
+                                "layout": "splitv",
+                                "sub_containers": [
+                                    {
+                                        "id": 30,
+                                        "version": 1,
+                                        "command": ["foot"],
+                                        "width": 800,
+                                        "height": 300,
+                                        "title": "foot",
+                                    },
+                                    {
+                                        "id": 31,
+                                        "version": 1,
+                                        "command": ["firefox"],
+                                        "width": 800,
+                                        "height": 700,
+                                        "title": "firefox",
+                                    },
+                                ],
+                            }
+                        ],
+                        "floating_containers": [],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def test_migration_keeps_absolute_sizes():
+    tree_json: dict = get_v1_profile()
+
+    assert migration.migrate_tree_json(tree_json) == 5
+    output_json: dict = tree_json["outputs"][0]
+    workspace_json: dict = output_json["workspaces"][0]
+    container_json: dict = workspace_json["containers"][0]
+    for node_json in [output_json, workspace_json, container_json] + container_json[
+        "sub_containers"
+    ]:
+        assert node_json["version"] == 2
+        assert node_json.get("width_fraction") is None
+        assert node_json.get("height_fraction") is None
+    assert output_json.get("width") is None
+    assert container_json["sub_containers"][0]["width"] == 800
+
+    assert migration.migrate_tree_json(tree_json) == 0
+
+
+def test_check_profiles(tmp_path: pathlib.Path):
+    with tmp_path.joinpath("old.json").open("w") as FILE:
+        json.dump(get_v1_profile(), FILE)
+    with tmp_path.joinpath("broken.json").open("w") as FILE:
+        FILE.write("{")
+    with tmp_path.joinpath("old.history.json").open("w") as FILE:
+        FILE.write("{}")
+
+    results = {
+        result.profile: result
+        for result in migration.check_profiles(tmp_path, jobs=1, dry_run=True)
+    }
+
+    assert sorted(results) == ["broken", "old"]
+    assert results["broken"].error is not None
+    assert results["old"].error is None
+    assert results["old"].migrated_nodes == 5
+    assert results["old"].windows == 2
+    assert results["old"].depth == 2
+    with tmp_path.joinpath("old.json").open("r") as FILE:
+        assert json.load(FILE) == get_v1_profile()
+
+    migration.check_profiles(tmp_path, jobs=1)
+    with tmp_path.joinpath("old.json").open("r") as FILE:
+        assert json.load(FILE)["outputs"][0]["version"] == 2
+
+
+def test_check_profile_reports_unusable_files(tmp_path: pathlib.Path):
+    with tmp_path.joinpath("no_objects.json").open("w") as FILE:
+        json.dump({"outputs": [1]}, FILE)
+    with tmp_path.joinpath("latin1.json").open("wb") as FILE:
+        FILE.write('{"outputs": [{"name": "Écran"}]}'.encode("latin-1"))
+    # a directory can't be read, also not by root
+    tmp_path.joinpath("unreadable.json").mkdir()
+
+    results = {
+        result.profile: result
+        for result in migration.check_profiles(tmp_path, jobs=1, dry_run=True)
+    }
+
+    assert sorted(results) == ["latin1", "no_objects", "unreadable"]
+    assert "AttributeError" in results["no_objects"].error
+    assert "UnicodeDecodeError" in results["latin1"].error
+    assert results["unreadable"].error.startswith("can't read profile")
@@ -0,0 +1,65 @@
+import json
+import pathlib
+
+import psutil
+import pytest
+
+import another_swayrst.ipc as ipc
+import another_swayrst.recording as recording
+
+
+def get_event(message_type: int, payload: str, reply: object) -> dict:
+    return {
+        "kind": "ipc",
+        "type": message_type,
+        "payload": payload,
+        "reply": json.dumps(reply),
+    }
+
+
+def test_replay_answers_in_recorded_order():
+    connection = recording.ReplayIpcConnection(
+        [
+            get_event(ipc.GET_TREE, "", {"id": 1}),
+            get_event(ipc.RUN_COMMAND, "workspace 1", [{"success": False}]),
+            get_event(ipc.GET_TREE, "", {"id": 2}),
+        ]
+    )
+
+    assert connection.get_tree() == {"id": 1}
+    assert connection.command("workspace 2; workspace 3") == [
+        {"success": True},
+        {"success": True},
+    ]
+    assert connection.command("workspace 1") == [{"success": False}]
+    assert connection.get_tree() == {"id": 2}
+    # requests beyond the recording get the last reply
+    assert connection.get_tree() == {"id": 2}
+    with pytest.raises(ConnectionError):
+        connection.get_outputs()
+    assert connection.message_count == 6
+    assert connection.command_count == 3
+
+
+def get_command(pid: int) -> list[str]:
+    if pid != 1:
+        raise psutil.NoSuchProcess(pid)
+    return ["foot"]
+
+
+def test_replay_of_a_recording(tmp_path: pathlib.Path):
+    recorder = recording.Recorder()
+    lookup = recorder.wrap_lookup(get_command)
+    recorder.record_ipc(ipc.GET_TREE, "", b'{"id": 1}')
+    assert lookup(1) == ["foot"]
+    with pytest.raises(psutil.Error):
+        lookup(2)
+    recording_file: pathlib.Path = tmp_path.joinpath("run.json")
+    recorder.write(recording_file, "load", {}, recording.ReplayIpcConnection([]))
+
+    replay = recording.Replay(recording_file)
+
+    assert replay.connection.get_tree() == {"id": 1}
+    assert replay.get_command(1) == ["foot"]
+    with pytest.raises(psutil.NoSuchProcess):
+        replay.get_command(2)
@@ -0,0 +1,445 @@
+import json
+import pathlib
+
+import pytest
+
+import another_swayrst.compact_tree as compact_tree
+import another_swayrst.main as main
+import another_swayrst.migration as migration
+import another_swayrst.types as types
+from another_swayrst.main import AnotherSwayrst
+
+from .fake_sway import FakeSway
+
+PROFILE_DIR: pathlib.Path = pathlib.Path(__file__).parent.parent.joinpath(
+    "test-profiles"
+)
+
+
+@pytest.fixture
+def swayrst(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> AnotherSwayrst:
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    tmp_path.joinpath("sway").mkdir()
+    return AnotherSwayrst(None, None, False, tmp_path, None, None, offline=True)
+
+
+def load_profile(profile_file: pathlib.Path) -> compact_tree.CompactTree:
+    with profile_file.open("r") as FILE:
+        tree_json: dict = json.load(FILE)
+    migration.migrate_tree_json(tree_json)
+    return compact_tree.CompactTree.from_profile(types.Tree.model_validate(tree_json))
+
+
+def get_workspaces(tree: compact_tree.CompactTree) -> list[tuple[int, int]]:
+    return [
+        (output, workspace)
+        for output in tree.children[0]
+        if tree.names[output] != "__i3"
+        for workspace in tree.children[output]
+    ]
+
+
+def get_structure(
+    tree: compact_tree.CompactTree, index: int, map_old_to_new_id: dict[int, int]
+) -> tuple | int | None:
+    """Return the layouts and app ids of the present apps of a profile subtree as nested tuples."""
+
+    if tree.kinds[index] == compact_tree.KIND_APP:
+        return map_old_to_new_id.get(tree.ids[index])
+    sub_structures: list = [
+        get_structure(tree, child, map_old_to_new_id) for child in tree.children[index]
+    ]
+    sub_structures = [
+        sub_structure for sub_structure in sub_structures if sub_structure is not None
+    ]
+    if len(sub_structures) == 0:
+        return None
+    return (tree.layouts[index], tuple(sub_structures))
+
+
+def build_layout(
+    swayrst: AnotherSwayrst,
+    tree: compact_tree.CompactTree,
+    map_old_to_new_id: dict[int, int],
+    other_app_ids: list[int] | None = None,
+) -> FakeSway:
+    """Build the layout of all workspaces of a profile out of the scratchpad."""
+
+    swayrst._restore_tree = tree
+    fake_sway = FakeSway(list(map_old_to_new_id.values()) + (other_app_ids or []))
+    first_present: list[int] = tree.get_first_present_apps(map_old_to_new_id)
+    for output, workspace in get_workspaces(tree):
+        fake_sway.command(
+            "; ".join(
+                swayrst._AnotherSwayrst__get_workspace_layout_commands(  # type: ignore
+                    output, workspace, first_present, map_old_to_new_id
+                )
+            )
+        )
+    return fake_sway
+
+
+@pytest.mark.parametrize(
+    "profile_file", sorted(PROFILE_DIR.glob("*.json")), ids=lambda path: path.stem
+)
+def test_layout_of_profile_is_built(
+    swayrst: AnotherSwayrst, profile_file: pathlib.Path
+):
+    tree: compact_tree.CompactTree = load_profile(profile_file)
+    map_old_to_new_id: dict[int, int] = {
+        tree.ids[app]: 1000 + tree.ids[app] for app in tree.leaves
+    }
+
+    fake_sway: FakeSway = build_layout(swayrst, tree, map_old_to_new_id)
+
+    for _, workspace in get_workspaces(tree):
+        assert fake_sway.get_structure(tree.numbers[workspace]) == get_structure(  # type: ignore
+            tree, workspace, map_old_to_new_id
+        )
+
+
+def test_layout_with_missing_apps_is_built(swayrst: AnotherSwayrst):
+    tree: compact_tree.CompactTree = load_profile(
+        PROFILE_DIR.joinpath("4-columns.json")
+    )
+    # the first app of every column is missing
+    missing_apps: set[int] = {
+        tree.first_app[column]
+        for column in range(len(tree))
+        if tree.kinds[column] == compact_tree.KIND_CONTAINER
+        and tree.kinds[tree.parents[tree.parents[column]]] != compact_tree.KIND_OUTPUT
+    }
+    map_old_to_new_id: dict[int, int] = {
+        tree.ids[app]: 1000 + tree.ids[app]
+        for app in tree.leaves
+        if app not in missing_apps
+    }
+
+    fake_sway: FakeSway = build_layout(swayrst, tree, map_old_to_new_id)
+
+    for _, workspace in get_workspaces(tree):
+        assert fake_sway.get_structure(tree.numbers[workspace]) == get_structure(  # type: ignore
+            tree, workspace, map_old_to_new_id
+        )
+
+
+def test_only_child_gets_a_sibling_before_it_is_split(swayrst: AnotherSwayrst):
+    # workspace 3 -> splith 226 -> splith 215 -> 4 columns, 207 is the first app
+    tree: compact_tree.CompactTree = load_profile(
+        PROFILE_DIR.joinpath("4-columns.json")
+    )
+    map_old_to_new_id: dict[int, int] = {
+        tree.ids[app]: 1000 + tree.ids[app] for app in tree.leaves
+    }
+
+    fake_sway: FakeSway = build_layout(swayrst, tree, map_old_to_new_id)
+
+    splits: list[int] = [
+        index
+        for index, command in enumerate(fake_sway.commands)
+        if command == "[con_id=1207] splith"
+    ]
+    assert len(splits) == 2
+    assert (
+        fake_sway.commands[splits[1] - 1]
+        == "[con_id=1208] move container to mark _another_swayrst_1207"
+    )
+
+
+def verify(
+    swayrst: AnotherSwayrst,
+    tree: compact_tree.CompactTree,
+    map_old_to_new_id: dict[int, int],
+    fake_sway: FakeSway,
+) -> None:
+    swayrst._AnotherSwayrst__ipc = fake_sway  # type: ignore
+    swayrst._AnotherSwayrst__verify_workspaces(  # type: ignore
+        tree.get_first_present_apps(map_old_to_new_id), map_old_to_new_id, {}
+    )
+
+
+def get_workspace(tree: compact_tree.CompactTree, name: str) -> int:
+    return next(
+        workspace
+        for _, workspace in get_workspaces(tree)
+        if tree.names[workspace] == name
+    )
+
+
+def get_mismatch(
+    swayrst: AnotherSwayrst,
+    tree: compact_tree.CompactTree,
+    map_old_to_new_id: dict[int, int],
+    fake_sway: FakeSway,
+) -> tuple[int, int, int | None]:
+    """Return the score, the maximal score and the id of the differing container of workspace 3."""
+
+    fix_commands: list[str] = []
+    score, max_score, mismatch = swayrst._AnotherSwayrst__score_workspace(  # type: ignore
+        get_workspace(tree, "3"),
+        fake_sway.output["nodes"][0],
+        tree.get_first_present_apps(map_old_to_new_id),
+        map_old_to_new_id,
+        {},
+        fix_commands,
+    )
+    return score, max_score, None if mismatch is None else tree.ids[mismatch[0]]
+
+
+@pytest.fixture
+def columns() -> tuple[compact_tree.CompactTree, dict[int, int]]:
+    tree: compact_tree.CompactTree = load_profile(
+        PROFILE_DIR.joinpath("4-columns.json")
+    )
+    return tree, {tree.ids[app]: 1000 + tree.ids[app] for app in tree.leaves}
+
+
+def test_built_layout_matches(swayrst: AnotherSwayrst, columns):
+    tree, map_old_to_new_id = columns
+    fake_sway: FakeSway = build_layout(swayrst, tree, map_old_to_new_id)
+
+    score, max_score, mismatch = get_mismatch(
+        swayrst, tree, map_old_to_new_id, fake_sway
+    )
+
+    assert score == max_score
+    assert mismatch is None
+
+
+@pytest.mark.parametrize(
+    "commands, differing_container",
+    [
+        # the first two apps of column 1 are swapped
+        (["[con_id=1207] swap container with con_id 1208"], 216),
+        # the first app of column 3 is moved to column 1
+        (
+            [
+                "[con_id=1207] mark --add tmp",
+                "[con_id=1213] move container to mark tmp",
+                "[con_id=1207] unmark tmp",
+            ],
+            215,
+        ),
+    ],
+)
+def test_differing_container_is_rebuilt(
+    swayrst: AnotherSwayrst, columns, commands: list[str], differing_container: int
+):
+    tree, map_old_to_new_id = columns
+    fake_sway: FakeSway = build_layout(swayrst, tree, map_old_to_new_id)
+    fake_sway.command("; ".join(commands))
+    expected_structure = get_structure(
+        tree, get_workspace(tree, "3"), map_old_to_new_id
+    )
+    assert fake_sway.get_structure(3) != expected_structure
+
+    score, max_score, mismatch = get_mismatch(
+        swayrst, tree, map_old_to_new_id, fake_sway
+    )
+    assert score < max_score
+    assert mismatch == differing_container
+
+    fake_sway.commands.clear()
+    verify(swayrst, tree, map_old_to_new_id, fake_sway)
+
+    assert fake_sway.get_structure(3) == expected_structure
+    # only the differing container is rebuilt
+    assert not any(
+        command.endswith("move scratchpad") for command in fake_sway.commands
+    )
+
+
+def test_fixes_stop_without_improvement(swayrst: AnotherSwayrst, columns):
+    tree, map_old_to_new_id = columns
+    swayrst._config.verify.max_fix_iterations = 5
+    fake_sway: FakeSway = build_layout(swayrst, tree, map_old_to_new_id, [9999])
+    # a window which isn't part of the profile can't be fixed
+    fake_sway.command("[con_id=9999] move container to workspace number 3")
+
+    verify(swayrst, tree, map_old_to_new_id, fake_sway)
+
+    assert fake_sway.commands.count("[con_id=1207] move scratchpad") == 1
+
+
+def get_app(app_id: int, **fractions: float) -> dict:
+    return {
+        "id": app_id,
+        "command": ["foot"],
+        "width": 100,
+        "height": 50,
+        "title": "foot",
+        **fractions,
+    }
+
+
+@pytest.mark.parametrize(
+    "output_sizes, target_sizes",
+    [
+        (
+            {"DP-1": (2000, 1000)},
+            {1030: (500, 1000), 1031: (1500, 1000), 1032: (100, 50), 1033: (400, 300)},
+        ),
+        # the size of the output is unknown
+        (
+            {},
+            {1030: (100, 50), 1031: (100, 50), 1032: (100, 50), 1033: (100, 50)},
+        ),
+    ],
+)
+def test_target_sizes_are_scaled_to_the_output(
+    swayrst: AnotherSwayrst,
+    output_sizes: dict[str, tuple[int, int]],
+    target_sizes: dict[int, tuple[int, int]],
+):
+    tree: compact_tree.CompactTree = compact_tree.CompactTree.from_profile(
+        types.Tree.model_validate(
+            {
+                "outputs": [
+                    {
+                        "id": 1,
+                        "name": "DP-1",
+                        "workspaces": [
+                            {
+                                "id": 10,
+                                "name": "1",
+                                "number": 1,
+                                "layout": "splith",
+                                "width_fraction": 1.0,
+                                "height_fraction": 1.0,
+                                "containers": [
+                                    get_app(
+                                        30, width_fraction=0.25, height_fraction=1.0
+                                    ),
+                                    get_app(
+                                        31, width_fraction=0.75, height_fraction=1.0
+                                    ),
+                                    # saved without fractions
+                                    get_app(32),
+                                    # missing app
+                                    get_app(
+                                        34, width_fraction=0.5, height_fraction=1.0
+                                    ),
+                                ],
+                                "floating_containers": [
+                                    get_app(33, width_fraction=0.2, height_fraction=0.3)
+                                ],
+                            }
+                        ],
+                    }
+                ]
+            }
+        )
+    )
+    swayrst._restore_tree = tree
+    output, workspace = get_workspaces(tree)[0]
+
+    assert (
+        swayrst._AnotherSwayrst__get_target_sizes(  # type: ignore
+            output,
+            workspace,
+            {30: 1030, 31: 1031, 32: 1032, 33: 1033},
+            output_sizes,
+        )
+        == target_sizes
+    )
+
+
+class FakeOutputs:
+    def __init__(self, outputs: list[dict]) -> None:
+        self.outputs: list[dict] = outputs
+
+    def get_outputs(self) -> list[dict]:
+        return self.outputs
+
+
+def get_output(name: str, width: int, height: int, scale: float = 1.0) -> dict:
+    return {
+        "name": name,
+        "active": True,
+        "current_mode": {"width": width, "height": height, "refresh": 60000},
+        "rect": {
+            "x": 0,
+            "y": 0,
+            "width": round(width / scale),
+            "height": round(height / scale),
+        },
+        "scale": scale,
+        "transform": "normal",
+    }
+
+
+def test_changed_outputs_are_reconfigured(swayrst: AnotherSwayrst):
+    saved_configuration = types.OutputConfiguration(
+        width=3840, height=2160, refresh=59997, x=0, y=0, scale=2.0, transform="90"
+    )
+    swayrst._AnotherSwayrst__output_configurations = {  # type: ignore
+        "DP-1": saved_configuration,
+        "DP-2": types.OutputConfiguration(
+            width=1920, height=1080, refresh=60000, x=0, y=0
+        ),
+    }
+    swayrst._AnotherSwayrst__ipc = FakeOutputs(  # type: ignore
+        [
+            get_output("DP-1", 1920, 1080),
+            get_output("DP-2", 1920, 1080),
+            {**get_output("HDMI-1", 1280, 720), "active": False},
+        ]
+    )
+
+    output_commands, output_sizes = swayrst._AnotherSwayrst__get_outputs()  # type: ignore
+
+    # DP-2 already has the saved configuration
+    assert output_commands == [
+        "output DP-1 mode 3840x2160@59.997Hz pos 0 0 scale 2.0 transform 90"
+    ]
+    # the logical size of DP-1 is scaled and rotated
+    assert output_sizes == {"DP-1": (1080, 1920), "DP-2": (1920, 1080)}
+
+    swayrst._config.restore_outputs = False
+    assert swayrst._AnotherSwayrst__get_outputs() == (  # type: ignore
+        [],
+        {"DP-1": (1920, 1080), "DP-2": (1920, 1080)},
+    )
+
+
+def test_script_is_only_rebuilt_if_stale(swayrst: AnotherSwayrst, columns):
+    tree, map_old_to_new_id = columns
+    fake_sway: FakeSway = build_layout(swayrst, tree, map_old_to_new_id, [9999])
+    swayrst._AnotherSwayrst__ipc = fake_sway  # type: ignore
+    with PROFILE_DIR.joinpath("4-columns.json").open("r") as FILE:
+        profile_json: dict = json.load(FILE)
+    migration.migrate_tree_json(profile_json)
+    swayrst._config.profile_dir.mkdir(parents=True, exist_ok=True)
+    with swayrst._config.profile_dir.joinpath("columns.json").open("w") as FILE:
+        json.dump(profile_json, FILE)
+
+    def get_checksum() -> str:
+        return swayrst._AnotherSwayrst__get_script_checksum(  # type: ignore
+            fake_sway.get_tree(), profile_json
+        )
+
+    checksum: str = get_checksum()
+    script_file = swayrst._config.profile_dir.joinpath("columns.swaymsg.sh")
+    with script_file.open("w") as FILE:
+        FILE.write(f"#!/bin/sh\n{main.SCRIPT_CHECKSUM_PREFIX}{checksum}\nexit 0\n")
+
+    swayrst.compile("columns", if_stale=True)
+    assert script_file.read_text().endswith("exit 0\n")
+
+    # the layout doesn't matter
+    fake_sway.command("[con_id=1207] splitv")
+    assert get_checksum() == checksum
+    # but the windows, the outputs, the profile and the configuration do
+    fake_sway.command("[con_id=9999] move container to workspace number 3")
+    assert get_checksum() != checksum
+    fake_sway.command("[con_id=9999] move scratchpad")
+    assert get_checksum() == checksum
+    fake_sway.scale = 2.0
+    assert get_checksum() != checksum
+    fake_sway.scale = 1.0
+    profile_json["outputs"][-1]["workspaces"][0]["name"] += " renamed"
+    assert get_checksum() != checksum
+    profile_json["outputs"][-1]["workspaces"][0]["name"] = "3"
+    assert get_checksum() == checksum
+    swayrst._config.restore_outputs = not swayrst._config.restore_outputs
+    assert get_checksum() != checksum